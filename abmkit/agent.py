@@ -0,0 +1,41 @@
+'''
+Compact replacement of mesa's Agent base class.
+
+mesa.Agent keeps its attributes (and those of every subclass) in a per
+instance __dict__, a few hundred bytes per agent before any state. SlotAgent
+has the same API (unique_id, model, pos, step, advance, random) with
+__slots__: a subclass declaring its own attributes in __slots__ stores them
+in fixed fields of the instance, with no __dict__, which takes a fraction of
+the memory and is faster to read.
+
+    class Walker(SlotAgent):
+        __slots__ = ('moore', 'energy')
+
+A subclass that leaves out __slots__ gets a __dict__ back, and the saving is
+lost. Class level defaults cannot share a name with a slot: set them in
+__init__. mesa only uses Agent in type hints, so its grids and schedulers
+take SlotAgents as they are.
+'''
+
+
+class SlotAgent:
+    '''
+    Base class for a model agent, with __slots__.
+    '''
+
+    __slots__ = ('unique_id', 'model', 'pos')
+
+    def __init__(self, unique_id, model):
+        self.unique_id = unique_id
+        self.model = model
+        self.pos = None
+
+    def step(self):
+        pass
+
+    def advance(self):
+        pass
+
+    @property
+    def random(self):
+        return self.model.random
@@ -0,0 +1,97 @@
+'''
+Low overhead replacement of mesa's DataCollector for model reporters.
+
+mesa's DataCollector appends one Python value per reporter and step to a list
+and builds the DataFrame at the end. ArrayCollector writes each collection as a
+row of a NumPy buffer preallocated for the expected number of steps (growing
+geometrically if the run is longer), can keep only one collection out of
+every N, and returns the DataFrame as a view of the buffer.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+class ArrayCollector:
+    '''
+    Collects model level variables in a preallocated NumPy buffer.
+
+    The API is the model reporter part of mesa.datacollection.DataCollector:
+    collect(model) and get_model_vars_dataframe().
+    '''
+
+    def __init__(self, model_reporters=None, steps=1000, every=1,
+                 dtype=np.float64):
+        '''
+        Args:
+            model_reporters: dict {name: reporter}. A reporter is a function of
+                             the model or the name of a model attribute.
+            steps: expected number of calls to collect(), to size the buffer.
+            every: keep one collection out of every `every` calls.
+            dtype: dtype of the buffer (all reporters share it).
+        '''
+        model_reporters = model_reporters or {}
+        self.names = list(model_reporters)
+        self.reporters = [self._reporter(r) for r in model_reporters.values()]
+        self.every = every
+        self.calls = 0
+        self.n = 0
+        rows = steps // every + 1
+        self.values = np.zeros((rows, len(self.names)), dtype=dtype)
+        self.index = np.zeros(rows, dtype=np.int64)
+
+    @staticmethod
+    def _reporter(reporter):
+        if isinstance(reporter, str):
+            return lambda model: getattr(model, reporter)
+        return reporter
+
+    def _reserve(self, rows):
+        '''
+        Make room for rows more collections, doubling the buffer as needed.
+        '''
+        capacity = len(self.index)
+        if self.n + rows <= capacity:
+            return
+        while capacity < self.n + rows:
+            capacity *= 2
+        values = np.zeros((capacity, len(self.names)), dtype=self.values.dtype)
+        index = np.zeros(capacity, dtype=np.int64)
+        values[:self.n] = self.values[:self.n]
+        index[:self.n] = self.index[:self.n]
+        self.values, self.index = values, index
+
+    def collect(self, model):
+        '''
+        Evaluate the reporters on model, if this call is one to keep.
+        '''
+        if self.calls % self.every == 0:
+            self._reserve(1)
+            row = self.values[self.n]
+            for j, reporter in enumerate(self.reporters):
+                row[j] = reporter(model)
+            self.index[self.n] = self.calls
+            self.n += 1
+        self.calls += 1
+
+    def extend(self, rows):
+        '''
+        Record rows (one per call, columns in reporter order) computed
+        elsewhere, as if collect() had been called len(rows) times.
+        '''
+        rows = np.asarray(rows)
+        calls = self.calls + np.arange(len(rows))
+        keep = calls % self.every == 0
+        k = np.count_nonzero(keep)
+        self._reserve(k)
+        self.values[self.n:self.n + k] = rows[keep]
+        self.index[self.n:self.n + k] = calls[keep]
+        self.n += k
+        self.calls += len(rows)
+
+    def get_model_vars_dataframe(self):
+        '''
+        The collected variables, indexed by call number, as a view of the buffer.
+        '''
+        return pd.DataFrame(self.values[:self.n], index=self.index[:self.n],
+                            columns=self.names, copy=False)
@@ -0,0 +1,92 @@
+'''
+Diagnostics of a model instance: levelled tracing routed to logging.
+
+The models used to compare a module global print level with
+print_level(prtl, PrtLvl.X) before every print, several times per agent and
+tick, and paid for the enum comparisons even when muted. A model now owns a
+Diagnostics built from its prtl argument. Its tracers concise, detailed and
+verbose are None when the level is off, and functions logging a message at
+that level otherwise:
+
+    verbose = self.model.diag.verbose      # once per method, or per step
+    for ...:
+        if verbose:
+            verbose('throwing dice', turtle=a.unique_id, p=a.p)
+
+With tracing off the cost is a truth test of a local variable, and the
+message is never formatted. A message is an event name plus keyword fields.
+It is logged with the fields in the record (extra: event, fields), so that
+handlers can filter or serialise them, and rendered as 'event k=v ...'.
+
+By default the messages go to the logger 'abmkit.trace', which prints them
+on stdout (the console output of the former prints). Pass logger to route
+them elsewhere; its level and handlers are left to the caller.
+'''
+
+import logging
+import sys
+from enum import IntEnum
+
+
+class PrtLvl(IntEnum):
+    Mute     = 1
+    Concise  = 2
+    Detailed = 3
+    Verbose  = 4
+
+
+def print_level(prtl, PRT):
+    '''True if messages of level PRT are shown at print level prtl'''
+    return prtl >= PRT
+
+
+TRACE = 5    # logging level of the verbose messages, below DEBUG
+logging.addLevelName(TRACE, 'TRACE')
+
+LOGGING_LEVELS = {PrtLvl.Concise: logging.INFO,
+                  PrtLvl.Detailed: logging.DEBUG,
+                  PrtLvl.Verbose: TRACE}
+
+
+def console_logger():
+    '''The default logger, printing the bare messages on stdout'''
+    logger = logging.getLogger('abmkit.trace')
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(TRACE)
+        logger.propagate = False
+    return logger
+
+
+class Diagnostics:
+    '''
+    Tracers of one model instance, for print level prtl.
+    '''
+
+    def __init__(self, prtl=PrtLvl.Mute, logger=None):
+        self.prtl = PrtLvl(prtl)
+        self.logger = console_logger() if logger is None else logger
+        self.concise = self.tracer(PrtLvl.Concise)
+        self.detailed = self.tracer(PrtLvl.Detailed)
+        self.verbose = self.tracer(PrtLvl.Verbose)
+
+    def tracer(self, level):
+        '''A function logging messages of the given level, None if they are not shown'''
+        if not print_level(self.prtl, level):
+            return None
+        logger, loglevel = self.logger, LOGGING_LEVELS[level]
+
+        def trace(event, **fields):
+            if logger.isEnabledFor(loglevel):
+                text = ' '.join([event] + [f'{k}={v}' for k, v in fields.items()])
+                logger.log(loglevel, text, extra=dict(event=event, fields=fields))
+        return trace
+
+    def __getstate__(self):
+        # tracers are closures: rebuilt on unpickling, as is the logger (by name)
+        return dict(prtl=self.prtl, logger=self.logger.name)
+
+    def __setstate__(self, state):
+        self.__init__(state['prtl'], logging.getLogger(state['logger']))
@@ -0,0 +1,130 @@
+'''
+Sparse replacement of mesa's MultiGrid for huge, mostly empty worlds.
+
+mesa's MultiGrid builds a set per cell (and the set of empty cells) for the
+whole width x height grid, so a 10,000 x 10,000 world takes tens of GB even
+with a few thousand agents. SparseMultiGrid keeps only the occupied cells,
+in a dict {(x, y): list of agents}: memory goes with the number of agents and
+the neighbourhood queries cost the same as in MultiGrid.
+
+The API is the part of MultiGrid the models use: place_agent, move_agent,
+remove_agent (and _place_agent / _remove_agent), get_cell_list_contents,
+get_neighborhood, get_neighbors, is_cell_empty, torus_adj, out_of_bounds.
+The neighbourhoods are sorted as in MultiGrid. The agents of a cell
+are kept in the order they arrived (MultiGrid's sets order them by memory
+address, which changes from run to run).
+
+coord_iter only visits the occupied cells, and there is no empties set.
+The neighbourhoods are computed on every query rather than cached per cell:
+away from the edges they are the sorted offsets of the neighbourhood added
+to the cell, only the cells whose neighbourhood wraps around are sorted.
+'''
+
+import functools
+import itertools
+
+
+def is_pos(cell_list):
+    '''True if cell_list is a single (x, y) position rather than a list of them'''
+    return isinstance(cell_list, tuple) and len(cell_list) == 2 and \
+        not isinstance(cell_list[0], tuple)
+
+
+@functools.lru_cache(maxsize=None)
+def neighbourhood_offsets(moore, include_center, radius):
+    '''(dx, dy) of the neighbourhood, sorted as MultiGrid sorts its cells'''
+    return tuple((dx, dy) for dx in range(-radius, radius + 1)
+                 for dy in range(-radius, radius + 1)
+                 if (dx or dy or include_center) and (moore or abs(dx) + abs(dy) <= radius))
+
+
+class SparseMultiGrid:
+    '''
+    Grid where each occupied cell holds a list of agents, stored in a dict.
+    '''
+
+    sparse = True
+
+    def __init__(self, width, height, torus):
+        self.width = width
+        self.height = height
+        self.torus = torus
+        self.cells = {}
+
+    def torus_adj(self, pos):
+        if not self.out_of_bounds(pos):
+            return pos
+        elif not self.torus:
+            raise Exception("Point out of bounds, and space non-toroidal.")
+        return pos[0] % self.width, pos[1] % self.height
+
+    def out_of_bounds(self, pos):
+        x, y = pos
+        return x < 0 or x >= self.width or y < 0 or y >= self.height
+
+    def place_agent(self, agent, pos):
+        self._place_agent(pos, agent)
+        agent.pos = pos
+
+    def _place_agent(self, pos, agent):
+        self.cells.setdefault(pos, []).append(agent)
+
+    def remove_agent(self, agent):
+        self._remove_agent(agent.pos, agent)
+        agent.pos = None
+
+    def _remove_agent(self, pos, agent):
+        cell = self.cells[pos]
+        cell.remove(agent)
+        if not cell:
+            del self.cells[pos]
+
+    def move_agent(self, agent, pos):
+        pos = self.torus_adj(pos)
+        self._remove_agent(agent.pos, agent)
+        self._place_agent(pos, agent)
+        agent.pos = pos
+
+    def is_cell_empty(self, pos):
+        return pos not in self.cells
+
+    def iter_cell_list_contents(self, cell_list):
+        if is_pos(cell_list):
+            cell_list = [cell_list]
+        cells = self.cells
+        return itertools.chain.from_iterable(cells[pos] for pos in cell_list if pos in cells)
+
+    def get_cell_list_contents(self, cell_list):
+        return list(self.iter_cell_list_contents(cell_list))
+
+    def iter_neighborhood(self, pos, moore, include_center=False, radius=1):
+        return iter(self.get_neighborhood(pos, moore, include_center, radius))
+
+    def get_neighborhood(self, pos, moore, include_center=False, radius=1):
+        '''The cells around pos, sorted as in MultiGrid'''
+        x, y = pos
+        W, H = self.width, self.height
+        offsets = neighbourhood_offsets(moore, include_center, radius)
+        if radius <= x < W - radius and radius <= y < H - radius:
+            return [(x + dx, y + dy) for dx, dy in offsets]   # sorted with the offsets
+        if self.torus:
+            # wrapping breaks the order of the offsets (and repeats cells on small tori)
+            return sorted({((x + dx) % W, (y + dy) % H) for dx, dy in offsets})
+        return [(x + dx, y + dy) for dx, dy in offsets
+                if 0 <= x + dx < W and 0 <= y + dy < H]
+
+    def iter_neighbors(self, pos, moore, include_center=False, radius=1):
+        return self.iter_cell_list_contents(
+            list(self.iter_neighborhood(pos, moore, include_center, radius)))
+
+    def get_neighbors(self, pos, moore, include_center=False, radius=1):
+        return list(self.iter_neighbors(pos, moore, include_center, radius))
+
+    def coord_iter(self):
+        '''The occupied cells, as (contents, x, y)'''
+        for (x, y), cell in list(self.cells.items()):
+            yield cell, x, y
+
+    def __len__(self):
+        '''Number of occupied cells'''
+        return len(self.cells)
@@ -0,0 +1,45 @@
+'''
+Morton (Z-order) ordering of agents held in arrays.
+
+With agents in random order, the per cell gathers and scatters of an array
+model (bincount over the cells, pressure[cell], fully_grown[cell], ...) jump
+all over the cell arrays. Sorting the agents by the Morton index of their
+cell, which interleaves the bits of x and y, puts the agents of a cell and
+of the cells around it next to each other, so that those accesses become
+mostly sequential. Agents move, so the order decays and is redone every few
+steps.
+
+Arrays:
+    morton_key(x, y)   : Z-order index of the cells (x, y), x and y < 2**32.
+    morton_order(x, y) : permutation sorting agents by morton_key, stable.
+    inverse(order)     : the permutation undoing order.
+'''
+
+import numpy as np
+
+MASKS = (0x0000FFFF0000FFFF, 0x00FF00FF00FF00FF, 0x0F0F0F0F0F0F0F0F,
+         0x3333333333333333, 0x5555555555555555)
+
+
+def spread_bits(v):
+    '''
+    Insert a zero bit after each of the 32 low bits of v (uint64).
+    '''
+    v = v.astype(np.uint64)
+    for shift, mask in zip((16, 8, 4, 2, 1), MASKS):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def morton_key(x, y):
+    return spread_bits(x) | (spread_bits(y) << np.uint64(1))
+
+
+def morton_order(x, y):
+    return np.argsort(morton_key(x, y), kind='stable')
+
+
+def inverse(order):
+    inv = np.empty_like(order)
+    inv[order] = np.arange(len(order), dtype=order.dtype)
+    return inv
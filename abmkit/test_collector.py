@@ -0,0 +1,53 @@
+'''
+Testing the ArrayCollector buffer growth and decimation.
+'''
+
+import numpy as np
+
+from abmkit.collector import ArrayCollector
+
+
+class Counter:
+    '''
+    Model whose only variable counts the calls to step.
+    '''
+
+    def __init__(self):
+        self.t = 0
+
+    def step(self):
+        self.t += 1
+
+
+def run(steps, expected, every):
+    model = Counter()
+    collector = ArrayCollector({'t': 't', 'twice': lambda m: 2 * m.t},
+                               steps=expected, every=every, dtype=np.int64)
+    collector.collect(model)
+    for _ in range(steps):
+        model.step()
+        collector.collect(model)
+    return collector.get_model_vars_dataframe()
+
+
+def test_grows_past_expected_steps():
+    df = run(steps=100, expected=10, every=1)
+    assert list(df.index) == list(range(101))
+    assert list(df.t) == list(range(101))
+    assert list(df.twice) == list(range(0, 202, 2))
+
+
+def test_keeps_one_row_every_n_calls():
+    df = run(steps=20, expected=20, every=5)
+    assert list(df.index) == [0, 5, 10, 15, 20]
+    assert list(df.t) == [0, 5, 10, 15, 20]
+
+
+def test_extend_matches_collect():
+    rows = np.arange(23)[:, None] * np.array([1, 2])
+    collector = ArrayCollector({'t': 't', 'twice': 't'}, steps=4, every=3, dtype=np.int64)
+    collector.extend(rows[:1])
+    collector.extend(rows[1:])
+    df = collector.get_model_vars_dataframe()
+    assert (df.values == rows[::3]).all()
+    assert list(df.index) == list(range(0, 23, 3))
@@ -0,0 +1,40 @@
+'''
+Testing the SparseMultiGrid against mesa's MultiGrid.
+'''
+
+from mesa.space import MultiGrid
+
+from abmkit.grid import SparseMultiGrid
+
+
+class Token:
+    def __init__(self):
+        self.pos = None
+
+
+def test_neighbourhoods_as_multigrid():
+    for width, height in ((7, 5), (2, 3), (1, 1), (9, 9)):
+        for torus in (True, False):
+            dense = MultiGrid(width, height, torus)
+            sparse = SparseMultiGrid(width, height, torus)
+            for x in range(width):
+                for y in range(height):
+                    for moore in (False, True):
+                        for center in (False, True):
+                            for radius in (1, 2):
+                                assert sparse.get_neighborhood((x, y), moore, center, radius) == \
+                                    dense.get_neighborhood((x, y), moore, center, radius)
+
+
+def test_only_occupied_cells_are_kept():
+    grid = SparseMultiGrid(10000, 10000, torus=True)
+    a, b = Token(), Token()
+    grid.place_agent(a, (0, 0))
+    grid.place_agent(b, (0, 0))
+    grid.move_agent(a, (-1, 3))
+    assert a.pos == (9999, 3)
+    assert len(grid) == 2
+    assert grid.get_neighbors((0, 2), True) == [a]
+    grid.remove_agent(b)
+    assert grid.is_cell_empty((0, 0))
+    assert len(grid) == 1
@@ -0,0 +1,57 @@
+'''
+Testing that the shared walkers move agents as the former per model code did.
+'''
+
+import random
+
+import numpy as np
+from mesa.space import MultiGrid
+
+from abmkit import walkers
+from abmkit.agent import SlotAgent
+
+
+class Model:
+    def __init__(self, width, height, seed):
+        self.grid = MultiGrid(width, height, torus=True)
+        self.random = random.Random(seed)
+
+
+def walk(move, steps=50, walkers_count=30, seed=1):
+    model = Model(12, 9, seed)
+    agents = []
+    for i in range(walkers_count):
+        a = SlotAgent(i, model)
+        model.grid.place_agent(a, (model.random.randrange(12), model.random.randrange(9)))
+        agents.append(a)
+    for _ in range(steps):
+        for a in agents:
+            move(a)
+    return [a.pos for a in agents]
+
+
+def former_random_move(agent):
+    grid = agent.model.grid
+    grid.move_agent(agent, agent.random.choice(grid.get_neighborhood(agent.pos, True, True)))
+
+
+def test_random_move_as_before():
+    assert walk(walkers.random_move) == walk(former_random_move)
+
+
+def test_walkable_neighbourhood_keeps_grid_order():
+    grid = MultiGrid(6, 5, torus=True)
+    walkable = np.random.default_rng(1).random((6, 5)) < 0.6
+    for x in range(6):
+        for y in range(5):
+            cells = walkers.neighbourhood(grid, (x, y), True, True, walkable)
+            assert cells == [c for c in grid.get_neighborhood((x, y), True, True) if walkable[c]]
+
+
+def test_bulk_move_stays_on_walkable_cells():
+    rng = np.random.default_rng(2)
+    walkable = rng.random((8, 7)) < 0.7
+    x, y = np.nonzero(walkable)
+    for _ in range(20):
+        x, y = walkers.bulk_move(x, y, 8, 7, rng, walkable=walkable)
+        assert walkable[x, y].all()
@@ -0,0 +1,161 @@
+'''
+Random walks on grids, shared by the agent and array models.
+
+The agent models all moved with the same get_neighborhood + choice +
+move_agent sequence. The agent moves here still take their neighbourhoods
+from the grid's get_neighborhood, which mesa caches per cell, so that the
+same random stream gives the same walk as before. With a walkable mask the
+walkable part of each neighbourhood is cached on the grid the first time
+its cell is visited. Populations stored as arrays use a NeighbourTable,
+the neighbourhoods of every cell as NumPy arrays.
+
+Agents:
+    random_move(agent, moore, walkable)     : uniform step, own cell included.
+    affinity_move(agent, affinity, occupied) : step attracted to (affinity > 0)
+                                               or avoiding (affinity < 0)
+                                               occupied cells.
+Arrays:
+    bulk_move(x, y, ...)     : uniform step of every walker at once.
+    weighted_move(x, y, ...) : step to a neighbour with probability
+                               proportional to a per cell weight (attractors
+                               and repellers).
+
+walkable is an optional boolean (width x height) mask indexed [x, y]: walkers
+only step into walkable cells.
+'''
+
+import numpy as np
+
+
+class NeighbourTable:
+    '''
+    Neighbourhoods of all the cells of a width x height grid, for array walkers.
+
+    index : (width*height x k) array of neighbour cell indices
+            (x * height + y), padded with -1.
+    count : number of neighbours of each cell.
+    '''
+
+    def __init__(self, width, height, moore=True, include_center=True, torus=True,
+                 walkable=None):
+        self.width = width
+        self.height = height
+        self.walkable = walkable
+        offsets = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                   if (include_center or dx or dy) and (moore or abs(dx) + abs(dy) <= 1)]
+
+        k = len(offsets)
+        self.index = np.full((width * height, k), -1, dtype=np.int64)
+        self.count = np.zeros(width * height, dtype=np.int64)
+        for x in range(width):
+            for y in range(height):
+                nbrs = []
+                for dx, dy in offsets:
+                    px, py = x + dx, y + dy
+                    if torus:
+                        px, py = px % width, py % height
+                    elif not (0 <= px < width and 0 <= py < height):
+                        continue
+                    if (px, py) in nbrs:
+                        continue
+                    if walkable is not None and not walkable[px, py]:
+                        continue
+                    nbrs.append((px, py))
+                c = x * height + y
+                self.count[c] = len(nbrs)
+                self.index[c, :len(nbrs)] = [px * height + py for px, py in nbrs]
+
+
+def neighbourhood(grid, pos, moore=True, include_center=True, walkable=None):
+    '''
+    The (walkable) neighbours of pos, in the order of the grid's get_neighborhood.
+    '''
+    cells = grid.get_neighborhood(pos, moore, include_center)
+    if walkable is None:
+        return cells
+    cache = grid.__dict__.setdefault('_walkable_neighbourhoods', {})
+    key = (moore, include_center, id(walkable))
+    if key not in cache:
+        cache[key] = (walkable, {})   # keeps the mask (and its id) alive
+    table = cache[key][1]
+    if pos not in table:
+        table[pos] = [(x, y) for x, y in cells if walkable[x, y]]
+    return table[pos]
+
+
+def random_move(agent, moore=True, walkable=None):
+    '''
+    Step the agent to a random cell of its neighbourhood, own cell included.
+    '''
+    grid = agent.model.grid
+    next_moves = neighbourhood(grid, agent.pos, moore, True, walkable)
+    grid.move_agent(agent, agent.random.choice(next_moves))
+
+
+def affinity_move(agent, affinity, occupied, moore=True, walkable=None):
+    '''
+    Step the agent to a neighbouring cell (not its own), biased by affinity.
+
+    affinity > 0: each occupied neighbour (occupied(pos) True) is a candidate
+                  with probability affinity.
+    affinity < 0: each empty neighbour is a candidate, and each occupied one
+                  with probability 1 + affinity.
+    affinity = 0: every neighbour is a candidate.
+    The agent moves to a random candidate, or to a random neighbour if there
+    is none (nor any walkable neighbour: then it stays).
+    '''
+    grid = agent.model.grid
+    allowed = neighbourhood(grid, agent.pos, moore, False, walkable)
+    if not allowed:
+        return
+    if affinity == 0:
+        selected = list(allowed)
+    elif affinity > 0:
+        selected = [pos for pos in allowed
+                    if occupied(pos) and np.random.random_sample() < affinity]
+    else:
+        selected = [pos for pos in allowed
+                    if not occupied(pos) or np.random.random_sample() >= -affinity]
+    if len(selected) == 0:
+        selected = list(allowed)
+    agent.random.shuffle(selected)
+    grid.move_agent(agent, selected[0])
+
+
+def bulk_move(x, y, width, height, rng, moore=True, torus=True, walkable=None,
+              table=None):
+    '''
+    New positions (x, y) of walkers each stepping to a random cell of its
+    neighbourhood, own cell included.
+
+    The Moore torus without mask draws dx, dy directly; other cases go
+    through a NeighbourTable (pass table to reuse one).
+    '''
+    if moore and torus and walkable is None and table is None:
+        d = rng.integers(-1, 2, size=(2, len(x)))
+        return (x + d[0]) % width, (y + d[1]) % height
+    if table is None:
+        table = NeighbourTable(width, height, moore, True, torus, walkable)
+    cell = x * height + y
+    pick = (rng.random(len(x)) * table.count[cell]).astype(np.int64)
+    new = table.index[cell, pick]
+    return new // height, new % height
+
+
+def weighted_move(x, y, table, weight, rng):
+    '''
+    New positions of walkers stepping to a neighbour of table with
+    probability proportional to weight (an array per cell index x*height+y,
+    >= 0). Walkers whose neighbours all have weight 0 step uniformly.
+    '''
+    height = table.height
+    cell = x * height + y
+    nbr = table.index[cell]
+    w = np.where(nbr >= 0, weight[nbr], 0.0)
+    none = w.sum(axis=1) == 0
+    w[none] = nbr[none] >= 0
+    cum = np.cumsum(w, axis=1)
+    u = rng.random(len(x)) * cum[:, -1]
+    pick = (cum <= u[:, None]).sum(axis=1)
+    new = nbr[np.arange(len(x)), pick]
+    return new // height, new % height
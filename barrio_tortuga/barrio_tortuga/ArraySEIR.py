@@ -0,0 +1,514 @@
+"""
+Array version of BarrioTortugaSEIR.
+
+The turtles are rows of NumPy arrays (position, kind, incubation and recovery
+times, transmission probability and the ticks at which they were exposed and
+became infected) rather than SeirTurtle objects. A tick is a few vectorised
+operations:
+
+1) E turtles whose incubation is over become I.
+2) Every I turtle tries to infect the S turtles in its Moore neighbourhood
+   (own cell included) with its probability p. Rather than throwing one dice
+   per pair, the probability that an S turtle escapes all the infectious
+   turtles around it, prod(1 - p_j), is computed per cell from the sum of
+   log(1 - p_j) over the 9 cells of the neighbourhood.
+3) I turtles whose infectious period is over become R.
+4) All turtles take one random step in their Moore neighbourhood.
+
+The kinds are stored as small integers (S, E, I, R = 0, 1, 2, 3).
+
+Who infected whom is kept in the infector and infection_tick arrays. Since the
+dice of all the infectious neighbours are combined, the infector of a newly
+exposed turtle is drawn among them with probability proportional to their
+hazard -log(1 - p). run_tiled does not update these arrays.
+
+With crn=True (common random numbers) every use of randomness draws from its
+own stream, all spawned from seed (see STREAMS), and the draws do not depend
+on the parameters: the times and probabilities are quantiles of one uniform
+per turtle, and every turtle throws its infection dice at every tick, whether
+susceptible or not. Runs with the same seed and different parameters then
+share initial state, walks and dice, and their differences are mostly due to
+the parameters (see crn.py).
+
+With coarse = m > 1 the turtles away from the epidemic are advanced m ticks
+at a time. Every m ticks the turtles are split in
+    active : E and I turtles, and S turtles that an infection could reach
+             within the next m ticks (closer than 2m + 1 cells, Chebyshev, to
+             an E or I turtle, or 3m + 1 if an S turtle can turn E and then I
+             within m ticks).
+    quiet  : the others (all the R turtles, the S ones far from the epidemic).
+The active turtles are stepped tick by tick as usual. Nothing but walking can
+happen to a quiet turtle in the next m ticks, so it jumps at once to where m
+random steps take it (the steps are the base 3 digits of one random integer).
+This is exact in distribution (the draws differ from those of the fixed
+step run), and the cost of a tick goes with the number of active turtles.
+Recorded positions of quiet turtles are those at the end of their jump.
+validation.validate_coarse compares the epidemic curves with the fixed step.
+
+The infection pressure is summed on a width x height grid. For huge, mostly
+empty worlds (sparse=True, the default when there are more than 16 cells per
+turtle) it is summed instead over the cells around the infectious turtles
+only, kept as a sorted array of cell indices rebuilt every tick, so that the
+memory and time of a tick go with the number of turtles, not of cells. The
+coarse stepping then finds the turtles near the epidemic by blocks of cells
+(near), which keeps a few more of them active than the dense test.
+
+With reorder = n > 0 the turtles are sorted every n ticks by the Morton
+(Z-order) index of their cell (abmkit.morton), so that the per cell gathers
+and scatters of a tick go through memory mostly in sequence. The state
+arrays (x, y, kind, times, P, ...) then hold the turtles in that order: ids
+gives the turtle held by each row. The turtles keep their identity outside:
+the trajectories are recorded, the transmission tree (infector and
+infection_tick) kept and the crn dice thrown by turtle id. The walks are
+drawn row by row, so a run with reorder follows the same dynamics as one
+without but not draw for draw; arms compared with crn must share reorder.
+"""
+
+from enum import IntEnum
+
+from mesa import Model
+import numpy as np
+from scipy.ndimage import maximum_filter
+from scipy.stats import gamma, nbinom
+
+from abmkit.collector import ArrayCollector
+from abmkit.morton import morton_order, inverse
+from abmkit.walkers import bulk_move
+
+from . stats import c19_nbinom_transform
+from . recorder import TrajectoryRecorder
+
+S, E, I, R = 0, 1, 2, 3
+KINDS = 'SEIR'
+Kind = IntEnum('Kind', [(k, i) for i, k in enumerate(KINDS)])   # Kind(code).name is the letter
+
+STREAMS = ('init', 'times', 'probs', 'dice', 'move', 'tree')
+
+# arrays holding one row per turtle, permuted by reorder_turtles
+TURTLE_STATE = ('ids', 'x', 'y', 'kind', 'Ti', 'Tr', 'P', 'tti', 'ttr', 'iel', 'iil')
+
+
+def count_kinds(kind):
+    """Number of turtles of each kind, in S, E, I, R order"""
+    return np.bincount(kind, minlength=4)
+
+
+def moore_sum(L):
+    """Sum of each cell of the (h x w) torus L and its 8 neighbours"""
+    Ly = L + np.roll(L, 1, axis=0) + np.roll(L, -1, axis=0)
+    return Ly + np.roll(Ly, 1, axis=1) + np.roll(Ly, -1, axis=1)
+
+
+def get_times(t_dist, t_mean, size, rng):
+    """Vector version of BarrioTortugaSEIR.time_sampler"""
+    if t_dist == 'E':
+        return rng.exponential(t_mean, size)
+    elif t_dist == 'G':
+        return rng.gamma(t_mean, 1.0, size)
+    else:
+        return np.full(size, float(t_mean))
+
+
+def time_quantiles(t_dist, t_mean, u):
+    """get_times from uniforms u, by inverting the distribution function"""
+    if t_dist == 'E':
+        return -t_mean * np.log1p(-u)
+    elif t_dist == 'G':
+        return gamma.ppf(u, t_mean)
+    else:
+        return np.full(len(u), float(t_mean))
+
+
+MOORE_DX = np.tile([-1, 0, 1], 3)
+MOORE_DY = np.repeat([-1, 0, 1], 3)
+
+
+def log_escape(p):
+    """log(1 - p), with p clipped so that a turtle never infects for sure"""
+    return np.log1p(-np.minimum(p, 1 - 1e-12))
+
+
+def choose_infectors(x, y, P, new, infectors, width, height, rng):
+    """For each newly exposed turtle in new, one of the infectors in its Moore
+    neighbourhood, drawn with probability proportional to -log(1 - P)"""
+    icell = y[infectors] * width + x[infectors]
+    order = np.argsort(icell, kind='stable')
+    scell = icell[order]
+
+    # candidates: the infectors in the 9 cells around each new turtle
+    ncell = (((y[new, None] + MOORE_DY) % height) * width +
+             (x[new, None] + MOORE_DX) % width).ravel()
+    lo  = np.searchsorted(scell, ncell, 'left')
+    cnt = np.searchsorted(scell, ncell, 'right') - lo
+    owner = np.repeat(np.repeat(np.arange(len(new)), 9), cnt)
+    first = np.repeat(lo, cnt) + np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+    cand  = infectors[order[first]]
+
+    # the smallest of exponential times with rates -log(1 - p) wins
+    with np.errstate(divide='ignore'):
+        key = rng.exponential(size=len(cand)) / -log_escape(P[cand])
+    o = np.lexsort((key, owner))
+    win = np.ones(len(o), dtype=bool)
+    win[1:] = owner[o][1:] != owner[o][:-1]
+    return cand[o[win]]
+
+
+def sparse_pressure(ix, iy, logq, x, y, width, height):
+    """Sum of logq of the infectors at (ix, iy) over the Moore neighbourhood of
+    each (x, y), without a width x height grid"""
+    t = (((iy[:, None] + MOORE_DY) % height) * width + (ix[:, None] + MOORE_DX) % width).ravel()
+    cells, inv = np.unique(t, return_inverse=True)
+    L = np.bincount(inv, weights=np.repeat(logq, 9))
+    if len(cells) == 0:
+        return np.zeros(len(x))
+    q = y * width + x
+    i = np.minimum(np.searchsorted(cells, q), len(cells) - 1)
+    return np.where(cells[i] == q, L[i], 0.)
+
+
+def near(x, y, sx, sy, r, width, height):
+    """True for the (x, y) with one of (sx, sy) within r cells (Chebyshev), and
+    for some a bit farther: the torus is cut in blocks of at least r x r cells
+    and the 9 blocks around each (x, y) are looked up"""
+    nbx, nby = max(width // r, 1), max(height // r, 1)
+
+    def block(x, y):
+        return np.minimum(y // r, nby - 1), np.minimum(x // r, nbx - 1)
+    sby, sbx = block(sx, sy)
+    blocks = np.unique(sby * nbx + sbx)
+    hit = np.zeros(len(x), dtype=bool)
+    if len(blocks) == 0:
+        return hit
+    by, bx = block(x, y)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            b = ((by + dy) % nby) * nbx + (bx + dx) % nbx
+            i = np.minimum(np.searchsorted(blocks, b), len(blocks) - 1)
+            hit |= blocks[i] == b
+    return hit
+
+
+def walk_table(m):
+    """Sum of the m base 3 digits of every integer in 0 ... 3^m - 1.
+    The digits of a uniform integer are m uniform steps in (0, 1, 2)."""
+    t = np.zeros(1, dtype=np.int8)
+    for _ in range(m):
+        t = (t[:, None] + np.arange(3, dtype=np.int8)).ravel()
+    return t
+
+
+def walk_displacement(table, k, rng, size):
+    """Displacement along one axis of size walkers taking k (at most m of
+    walk_table(m), a number or an array) random steps in (-1, 0, 1)"""
+    v = rng.integers(len(table), size=size, dtype=np.int64)
+    if np.isscalar(k):
+        return table[v] - np.int8(k)
+    return table[v % 3**k] - k
+
+
+def number_of_infected(model):
+    return model.number_of_agents('I')
+
+
+def number_of_susceptible(model):
+    return model.number_of_agents('S')
+
+
+def number_of_recovered(model):
+    return model.number_of_agents('R')
+
+
+def number_of_exposed(model):
+    return model.number_of_agents('E')
+
+
+class ArraySEIR(Model):
+    """SEIR epidemics of BarrioTortugaSEIR on NumPy arrays.
+
+    The parameters and their meaning are those of BarrioTortugaSEIR (see its
+    docstring for the calibration of p), plus:
+        seed   : seed of the NumPy random generator.
+        crn    : common random numbers, one stream per use of randomness.
+        coarse : ticks per step of the turtles away from the epidemic.
+        sparse : infection pressure computed without width x height arrays.
+        reorder: ticks between Morton sorts of the turtles, 0 for never.
+
+    The datacollector reports the same four series, in the same order.
+    """
+
+    def __init__(self,
+                 ticks_per_day =    5,
+                 turtles       = 1000,
+                 i0            =   10,
+                 r0            =    3.5,
+                 ti            =    5.5,
+                 tr            =    3.5,
+                 ti_dist       =    'F',    # F for fixed, E for exp G for Gamma
+                 tr_dist       =    'F',
+                 p_dist        =    'F',    # F for fixed, S for Binomial, P for Poissoin
+                 width         =   40,
+                 height        =   40,
+                 nc_factor     =    1,      # correction to the number of contacts (see calibration.py)
+                 k             = None,      # dispersion of R0 for p_dist S and P, overrides the default
+                 mobility      =    1.,     # probability that a turtle moves in a tick
+                 expected_steps =  500,     # sizes the datacollector buffers
+                 collect_every  =    1,     # keep one datacollector row every N steps
+                 record         = None,     # directory where to record turtle trajectories
+                 record_stride  =    5,     # ticks between position snapshots
+                 crn           = False,     # common random numbers (see module docstring)
+                 coarse        =    1,      # ticks per step of the quiet turtles (see module docstring)
+                 sparse        = None,      # infection pressure without grid, default if > 16 cells per turtle
+                 reorder       =    0,      # ticks between Morton sorts of the turtles, 0 for never
+                 seed          = None):
+
+        self.ticks_per_day = ticks_per_day
+        self.height     = height
+        self.width      = width
+        self.moore      = True
+        self.steps      = 0
+
+        self.turtles  = turtles
+        self.i0       = i0
+        self.r0       = r0
+        self.ti_dist  = ti_dist
+        self.tr_dist  = tr_dist
+        self.p_dist   = p_dist
+        self.mobility = mobility
+        self.coarse   = coarse
+        self.sparse   = width * height > 16 * turtles if sparse is None else sparse
+        self.reorder  = reorder
+        self.active   = None     # turtles stepped tick by tick, None for all
+        self.stepped  = 0        # turtle ticks stepped one by one
+        if coarse > 1:
+            self.walk = walk_table(coarse)
+
+        self.crn = crn
+        self.rng = np.random.default_rng(seed)
+        if crn:
+            self.streams = dict(zip(STREAMS, [np.random.default_rng(s) for s in
+                                              np.random.SeedSequence(seed).spawn(len(STREAMS))]))
+        else:
+            self.streams = dict.fromkeys(STREAMS, self.rng)
+
+        # average number of contacts and infection probability, as in BarrioTortugaSEIR
+        self.nc_factor = nc_factor
+        self.nc = nc_factor * 9 * self.turtles / (self.width * self.height)
+        self.ti = ti
+        self.tr = tr
+        self.k = 1
+        if   self.p_dist == 'S':
+            self.k  = 0.16
+        elif self.p_dist == 'P':
+            self.k = 1e+4
+        if k is not None:
+            self.k = k
+        self.p = self.r0 /(self.nc * self.tr * self.ticks_per_day)
+
+        # turtle state
+        n = self.turtles
+        init = self.streams['init']
+        self.ids  = np.arange(n)     # turtle held by each row
+        self.x    = init.integers(self.width, size=n)
+        self.y    = init.integers(self.height, size=n)
+        self.kind = np.full(n, S, dtype=np.int8)
+        self.kind[init.choice(n, size=i0, replace=False)] = I
+
+        # times are drawn in days and kept in ticks
+        if crn:
+            u = self.streams['times'].random((2, n))
+            self.Ti = time_quantiles(self.ti_dist, self.ti, u[0])
+            self.Tr = time_quantiles(self.tr_dist, self.tr, u[1])
+        else:
+            self.Ti = get_times(self.ti_dist, self.ti, n, self.rng)
+            self.Tr = get_times(self.tr_dist, self.tr, n, self.rng)
+        self.P   = self.get_probs(n)
+        self.tti = self.Ti * ticks_per_day
+        self.ttr = self.Tr * ticks_per_day
+        self.iel = np.zeros(n, dtype=np.int64)   # tick at which turtle became E
+        self.iil = np.zeros(n, dtype=np.int64)   # tick at which turtle became I
+
+        # transmission tree, by turtle id: -1 infector for the initial infected, -1 tick for never infected
+        self.infector       = np.full(n, -1, dtype=np.int64)
+        self.infection_tick = np.where(self.kind == I, 0, -1)
+
+        self.recorder = None
+        if record is not None:
+            self.recorder = TrajectoryRecorder(record, n, width, height, record_stride)
+            self.recorder.initial(self.kind)
+            self.recorder.positions(0, *self.positions())
+
+        self.datacollector = ArrayCollector(
+            model_reporters = {"NumberOfInfected": number_of_infected,
+                               "NumberOfSusceptible": number_of_susceptible,
+                               "NumberOfRecovered": number_of_recovered,
+                               "NumberOfExposed": number_of_exposed},
+            steps = expected_steps, every = collect_every, dtype = np.int64)
+        self.running = True
+        self.datacollector.collect(self)
+
+
+    def get_probs(self, n):
+        if self.p_dist == 'S' or self.p_dist == 'P':
+            nb, pb = c19_nbinom_transform(self.r0, self.k)
+            if self.crn:
+                r0 = nbinom.ppf(self.streams['probs'].random(n), nb, pb)
+            else:
+                r0 = self.rng.negative_binomial(nb, pb, n)
+            return r0 /(self.nc * self.tr * self.ticks_per_day)
+        else:
+            return np.full(n, self.p)
+
+
+    def cell(self, idx=slice(None)):
+        return self.y[idx] * self.width + self.x[idx]
+
+
+    def pressure_at(self, infectors, turtles):
+        """Sum of log(1 - p) over the infectious turtles around each of turtles"""
+        if self.sparse:
+            return sparse_pressure(self.x[infectors], self.y[infectors],
+                                   log_escape(self.P[infectors]),
+                                   self.x[turtles], self.y[turtles], self.width, self.height)
+        return self.infection_pressure(infectors)[self.cell(turtles)]
+
+
+    def infection_pressure(self, infectors):
+        """Per cell sum of log(1 - p) over the infectious turtles in the Moore neighbourhood"""
+        L = np.bincount(self.cell(infectors), weights=log_escape(self.P[infectors]),
+                        minlength=self.width * self.height)
+        return moore_sum(L.reshape(self.height, self.width)).ravel()
+
+
+    def choose_infectors(self, new, infectors):
+        """For each newly exposed turtle, one of the infectious turtles of its neighbourhood,
+        drawn with probability proportional to -log(1 - p)"""
+        return choose_infectors(self.x, self.y, self.P, new, infectors,
+                                self.width, self.height, self.streams['tree'])
+
+
+    def reorder_turtles(self):
+        """Sort the turtles by the Morton index of their cell"""
+        order = morton_order(self.x, self.y)
+        for name in TURTLE_STATE:
+            setattr(self, name, getattr(self, name)[order])
+        if self.active is not None:
+            self.active = np.sort(inverse(order)[self.active])
+
+
+    def positions(self):
+        """x and y of the turtles, by id"""
+        if self.reorder:
+            rows = inverse(self.ids)
+            return self.x[rows], self.y[rows]
+        return self.x, self.y
+
+
+    def members(self, kind):
+        """Turtles of kind among those stepped this tick"""
+        if self.active is None:
+            return np.flatnonzero(self.kind == kind)
+        return self.active[self.kind[self.active] == kind]
+
+
+    def plan_coarse(self):
+        """Split the turtles in active and quiet for the next coarse ticks,
+        and move the quiet ones to the end of their walk"""
+        m  = self.coarse
+        sick = (self.kind == E) | (self.kind == I)
+        sus  = self.kind == S
+        r = 2 * m + 1
+        if sus.any() and self.tti[sus].min() < m:
+            r = 3 * m + 1     # a chain E -> I can go on within the m ticks
+        if self.sparse:
+            close = near(self.x, self.y, self.x[sick], self.y[sick], r, self.width, self.height)
+        else:
+            grid = np.zeros((self.height, self.width), dtype=bool)
+            grid[self.y[sick], self.x[sick]] = True
+            close = maximum_filter(grid, size=(min(2 * r + 1, self.height),
+                                               min(2 * r + 1, self.width)),
+                                   mode='wrap')[self.y, self.x]
+        active = sick | (sus & close)
+        self.active = np.flatnonzero(active)
+
+        # the quiet turtles take m steps at once, the active ones stay for now
+        rng = self.streams['move']
+        k = m if self.mobility == 1 else rng.binomial(m, self.mobility, self.turtles)
+        dx = walk_displacement(self.walk, k, rng, self.turtles)
+        dy = walk_displacement(self.walk, k, rng, self.turtles)
+        dx[active] = 0
+        dy[active] = 0
+        self.x = (self.x + dx) % self.width
+        self.y = (self.y + dy) % self.height
+
+
+    def step(self):
+        t = self.steps
+        if self.reorder and t % self.reorder == 0:
+            self.reorder_turtles()
+        if self.coarse > 1 and t % self.coarse == 0:
+            self.plan_coarse()
+        self.stepped += self.turtles if self.active is None else len(self.active)
+        infectors = self.members(I)
+
+        # When time is larger than incubation time, become infected
+        exposed = self.members(E)
+        turn = exposed[t - self.iel[exposed] > self.tti[exposed]]
+        self.kind[turn] = I
+        self.iil[turn]  = t
+
+        # infect susceptibles around infectious turtles
+        new = infectors[:0]
+        if self.crn:
+            dice = self.streams['dice'].random(self.turtles)
+        if len(infectors):
+            susceptible = self.members(S)
+            L = self.pressure_at(infectors, susceptible)
+            u = dice[self.ids[susceptible]] if self.crn else self.rng.random(len(susceptible))
+            new = susceptible[u < -np.expm1(L)]
+            self.kind[new] = E
+            self.iel[new]  = t
+            self.infector[self.ids[new]]       = self.ids[self.choose_infectors(new, infectors)]
+            self.infection_tick[self.ids[new]] = t
+
+        # When time is larger than recovery time, become recovered
+        recover = infectors[t - self.iil[infectors] > self.ttr[infectors]]
+        self.kind[recover] = R
+
+        self.random_move()
+        self.steps += 1
+        self.datacollector.collect(self)
+
+        if self.recorder is not None:
+            ids = self.ids
+            self.recorder.events(ids[turn], t, E, I)
+            self.recorder.events(ids[new], t, S, E, self.infector[ids[new]])
+            self.recorder.events(ids[recover], t, I, R)
+            self.recorder.positions(self.steps, *self.positions())
+
+
+    def close_recorder(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+    def random_move(self):
+        """Step one cell in any direction of the Moore neighbourhood, or stay.
+        With mobility < 1 only a fraction mobility of the turtles (drawn every tick) moves.
+        With coarse > 1 only the active turtles are stepped."""
+        rng = self.streams['move']
+        moving = self.active
+        if self.mobility < 1:
+            n = self.turtles if moving is None else len(moving)
+            sel = rng.random(n) < self.mobility
+            moving = np.flatnonzero(sel) if moving is None else moving[sel]
+        if moving is None:
+            self.x, self.y = bulk_move(self.x, self.y, self.width, self.height, rng)
+        else:
+            self.x[moving], self.y[moving] = bulk_move(self.x[moving], self.y[moving],
+                                                       self.width, self.height, rng)
+
+
+    def number_of_agents(self, kind):
+        if kind == 'A':
+            return self.turtles
+        return int(np.count_nonzero(self.kind == KINDS.index(kind)))
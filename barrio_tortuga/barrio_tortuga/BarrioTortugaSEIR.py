@@ -1,18 +1,24 @@
+import random
+
 from mesa import Model
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
-from mesa import Agent
 from mesa.time import RandomActivation
 import numpy as np
+from scipy import sparse
 
-from scipy.stats import gamma
-from scipy.stats import expon
-from . stats import c19_nbinom_rvs
+from abmkit.agent import SlotAgent
+from abmkit.collector import ArrayCollector
+from abmkit.diagnostics import Diagnostics, PrtLvl
+from abmkit.grid import SparseMultiGrid
+from abmkit import walkers
 
-from . utils import PrtLvl, print_level, throw_dice
+from . stats import c19_nbinom_sampler
+from . stats import expon_sampler, gamma_sampler, fixed_sampler
+from . recorder import TrajectoryRecorder, KINDS
+from . BarrioTortuga import get_doors
+from . ArraySEIR import S, E, I, R, moore_sum, log_escape, choose_infectors
 
-CALIB = False
-prtl=PrtLvl.Concise
+from . utils import throw_dice
 
 def number_turtles_in_cell(cell):
     turtles = [obj for obj in cell if isinstance(obj, SeirTurtle)]
@@ -27,23 +33,19 @@ def turtles_in_cell(cell):
 
 
 def number_of_infected(model):
-    a =[agent for agent in model.schedule.agents if agent.kind=='I']
-    return len(a)
+    return model.number_of_agents('I')
 
 
 def number_of_susceptible(model):
-    a =[agent for agent in model.schedule.agents if agent.kind=='S']
-    return len(a)
+    return model.number_of_agents('S')
 
 
 def number_of_recovered(model):
-    a =[agent for agent in model.schedule.agents if agent.kind=='R']
-    return len(a)
+    return model.number_of_agents('R')
 
 
 def number_of_exposed(model):
-    a =[agent for agent in model.schedule.agents if agent.kind=='E']
-    return len(a)
+    return model.number_of_agents('E')
 
 
 def in_range(x, xmin, xmax):
@@ -56,66 +58,60 @@ def number_of_turtles_in_neighborhood(model):
     nc = 0
     ng = 0
     NC = []
+    verbose = model.diag.verbose
     for y in range(model.grid.height):
         for x in range(model.grid.width):
             ng +=1
 
-            if print_level(prtl, PrtLvl.Verbose):
-                if in_range(x,2,3) and in_range(y,2,3):
-                    print(f'x = {x} y = {y}')
+            if verbose and in_range(x,2,3) and in_range(y,2,3):
+                verbose(f'x = {x} y = {y}')
 
             c = model.grid.get_cell_list_contents((x,y))
             n_turtles_in_c = number_turtles_in_cell(c)
 
-            if print_level(prtl, PrtLvl.Verbose):
-                if in_range(x,0,3) and in_range(y,2,3):
-                    print(f'number of turtles in this cell  = {n_turtles_in_c}')
+            if verbose and in_range(x,0,3) and in_range(y,2,3):
+                verbose(f'number of turtles in this cell  = {n_turtles_in_c}')
 
             if n_turtles_in_c > 0:
                 #coordinates of neighbors
                 n_xy = model.grid.get_neighborhood((x,y), model.moore, True)
 
-                if print_level(prtl, PrtLvl.Verbose):
-                    if in_range(x,2,3) and in_range(y,2,3):
-                        print(f'coordinates of neighbors inlcuding center = {n_xy}')
+                if verbose and in_range(x,2,3) and in_range(y,2,3):
+                    verbose(f'coordinates of neighbors inlcuding center = {n_xy}')
 
                 ncc = 0
                 for xy in n_xy:
-                    if print_level(prtl, PrtLvl.Verbose):
-                        if in_range(x,2,3) and in_range(y,2,3):
-                            print(f'coordinates of neighbors = {xy}')
+                    if verbose and in_range(x,2,3) and in_range(y,2,3):
+                        verbose(f'coordinates of neighbors = {xy}')
 
                     cn = model.grid.get_cell_list_contents(xy)
                     n_turtles_nb = number_turtles_in_cell(cn)
 
-                    if print_level(prtl, PrtLvl.Verbose):
-                        if in_range(x,2,3) and in_range(y,2,3):
-                            print(f'nof turtles = {n_turtles_nb}')
+                    if verbose and in_range(x,2,3) and in_range(y,2,3):
+                        verbose(f'nof turtles = {n_turtles_nb}')
 
                     if n_turtles_nb > 0:
                         nc += n_turtles_nb
                         ncc += n_turtles_nb
                 NC.append(ncc)
 
-                if print_level(prtl, PrtLvl.Verbose):
-                    if in_range(x,2,3) and in_range(y,2,3):
-                        print(f'nof turtles in cell and neighbors = {ncc}')
+                if verbose and in_range(x,2,3) and in_range(y,2,3):
+                    verbose(f'nof turtles in cell and neighbors = {ncc}')
 
-    if print_level(prtl, PrtLvl.Verbose):
-        print(f'NC = {NC}')
-        print(f'NC mean = {np.mean(NC)}')
+    if verbose:
+        verbose('NC', NC=NC, mean=np.mean(NC))
     #return (nc -1) /ng
     return np.mean(NC)
 
 
-def get_time(t_dist, t_mean):
+def time_sampler(t_dist, t_mean, rng=None):
+    """Block sampler of the times: exponential (E), gamma of shape t_mean (G) or fixed"""
     if t_dist == 'E':
-        #print(f'throw exp  scale ={t_mean}')
-        return expon.rvs(scale=t_mean)
+        return expon_sampler(t_mean, rng)
     elif t_dist == 'G':
-        return gamma.rvs(a=t_mean, scale=1.0)
+        return gamma_sampler(t_mean, 1.0, rng)
     else:
-        return t_mean
+        return fixed_sampler(t_mean, rng)
 
 
 class BarrioTortugaSEIR(Model):
@@ -148,10 +144,63 @@ class BarrioTortugaSEIR(Model):
        Two quantities can be taken as known, R0 and ti. Then one can determine p as:
            p = R0 /(c * ti)
 
+       Since turtles move, the effective number of contacts differs from 9 N / a.
+       The nc_factor parameter multiplies nc; calibration.calibrate fits it so that
+       the index cases infect R0 turtles on average.
+
+        The model draws from two streams: mesa's self.random (placement and
+        activation order), seeded with seed, and the global numpy stream (times,
+        probabilities, dice), which the caller seeds. ensemble.seeded_model
+        seeds both.
+
         Stochastic behaviour can be introduced in:
         1) ti and tr, which can be chosen to be either gamma or exponentially distributed
         2) p, via R0, which can be chosen to be either negative binomial or Poisson.
 
+        Who infected whom is kept in the arrays infector (turtle id of the infector,
+        -1 for the initial infected) and infection_tick (-1 if never infected),
+        indexed by turtle id. See analysis.offspring and friends.
+
+        If map_file is given (barrio-tortuga-map*.txt) the grid is the barrio map:
+        turtles only walk the streets and live in homes of home_size turtles, each
+        home going out by one of the doors of BarrioTortuga.get_doors(nd). The
+        contact density nc counts only the street cells. Infectious turtles also
+        infect each susceptible housemate with probability p_home per tick; the
+        housemates of every turtle are the sparse matrix household (turtles x
+        turtles, H H^T without diagonal for H the turtle x home membership), so
+        that this costs one sparse matrix-vector product per tick.
+
+        If record is a directory, the changes of kind of every turtle (with the
+        infector for S -> E) and the positions every record_stride ticks are
+        streamed there (see recorder.py). Call close_recorder() at the end of the run.
+
+        mobility < 1 lowers the movement: each tick a turtle moves with probability
+        mobility. scenarios.py changes it (and p) when forking a running model.
+
+        Hybrid mode. With hybrid set, at the start of every tick the cells where
+        the local prevalence (infectious over turtles in the Moore neighbourhood)
+        is above hybrid are aggregated: their susceptibles are infected as counts,
+        a binomial number per cell with the escape probability from all the
+        infectious around (as ArraySEIR), and the infectious turtles whose whole
+        neighbourhood is aggregated skip their pair by pair dice. Elsewhere the
+        turtles infect one by one. Around the peak most infectious turtles are in
+        aggregated cells, which is where the pair by pair loop costs most. The
+        representation is chosen once per tick, so a susceptible walking from a
+        turtle resolved cell into an aggregated one misses, during that tick, the
+        infectious turtles that skipped their dice.
+
+        With sparse=True the grid is an abmkit.grid.SparseMultiGrid, holding only
+        the occupied cells, so that worlds of 10,000 x 10,000 cells fit in memory.
+        The hybrid mode and calib still go over every cell.
+
+        With calib=True every turtle is susceptible and the datacollector reports
+        NumberOfneighbors, the mean number of turtles in the Moore neighbourhood
+        of the occupied cells, to check the contact density nc.
+
+        prtl sets the messages printed (see abmkit.diagnostics): PrtLvl.Concise the
+        parameters, Detailed the changes of kind, Verbose every infection attempt.
+        They go to logger if given (a logging.Logger), to stdout otherwise.
+
     """
 
 
@@ -166,14 +215,44 @@ class BarrioTortugaSEIR(Model):
                  tr_dist       =    'F',
                  p_dist        =    'F',    # F for fixed, S for Binomial, P for Poissoin
                  width         =   40,
-                 height        =   40):
-
+                 height        =   40,
+                 nc_factor     =    1,      # correction to the number of contacts (see calibration.py)
+                 k             = None,      # dispersion of R0 for p_dist S and P, overrides the default
+                 map_file      = None,      # barrio map, None for an empty torus
+                 nd            =    2,      # choice of doors (see BarrioTortuga.get_doors)
+                 home_size     =    2,      # turtles per home
+                 p_home        =    0.,     # infection probability per tick and infectious housemate
+                 mobility      =    1.,     # probability that a turtle moves in a tick
+                 hybrid        = None,      # local prevalence above which cells are aggregated
+                 sparse        = False,     # sparse grid, for huge mostly empty worlds
+                 expected_steps =  500,     # sizes the datacollector buffers
+                 collect_every  =    1,     # keep one datacollector row every N steps
+                 record         = None,     # directory where to record turtle trajectories
+                 record_stride  =    5,     # ticks between position snapshots
+                 calib          = False,    # susceptibles only, reporting the number of neighbours
+                 prtl           = PrtLvl.Concise,   # print level (see abmkit.diagnostics)
+                 logger         = None,     # logging.Logger of the messages, default stdout
+                 seed           = None):    # seed of self.random (see ensemble.seeded_model)
+
+
+        self.random     = random.Random(seed)   # per instance: mesa keeps it in the class
+        self.diag       = Diagnostics(prtl, logger)
+        self.calib      = calib
 
         # define grid and schedule
         self.ticks_per_day = ticks_per_day
         self.height     = height
         self.width      = width
-        self.grid       = MultiGrid(self.height, self.width, torus=True)
+        self.map_bt     = None
+        self.walkable   = None
+        if map_file is not None:
+            self.map_bt = np.genfromtxt(map_file)
+            self.width, self.height = self.map_bt.shape
+            self.walkable = self.map_bt != 1
+        if sparse:
+            self.grid   = SparseMultiGrid(self.height, self.width, torus=True)
+        else:
+            self.grid   = MultiGrid(self.height, self.width, torus=True)
         self.moore      = True
         self.schedule   = RandomActivation(self)
 
@@ -183,7 +262,17 @@ class BarrioTortugaSEIR(Model):
 
         # average number of contacts:  nc = 9 * N / area
         # where N / area is the average population per cell and 9 the number of cells
-        self.nc         = 9 * self.turtles / (self.width * self.height)
+        # nc_factor corrects it for the actual contacts of a moving turtle (see calibration.py)
+        self.nc_factor  = nc_factor
+        area            = self.width * self.height
+        if self.map_bt is not None:
+            area = np.count_nonzero(self.map_bt != 1)  # turtles live in the streets
+        self.nc         = nc_factor * 9 * self.turtles / area
+        self.p_home     = p_home
+        self.mobility   = mobility
+        self.hybrid     = hybrid
+        self.aggregated = None    # S turtles (by id) infected as counts this tick
+        self.hot_zone   = None    # cells whose whole neighbourhood is aggregated
 
         # counters
         self.P        = []
@@ -204,12 +293,22 @@ class BarrioTortugaSEIR(Model):
             self.k  = 0.16
         elif self.p_dist == 'P':
             self.k = 1e+4
+        if k is not None:
+            self.k = k
 
         # infection probability for fixed case
         self.p   = self.r0 /(self.nc * self.tr * self.ticks_per_day)
 
-        if print_level(prtl, PrtLvl.Concise):
-            print(f""" Simulation Parameters:
+        # times and R0 of the turtles are drawn in blocks, from a generator seeded
+        # by the global numpy stream so that np.random.seed still fixes a run
+        self.rng        = np.random.default_rng(np.random.randint(2**32))
+        self.ti_sampler = time_sampler(self.ti_dist, self.ti, self.rng)
+        self.tr_sampler = time_sampler(self.tr_dist, self.tr, self.rng)
+        self.r0_sampler = c19_nbinom_sampler(self.r0, self.k, self.rng)
+
+        concise = self.diag.concise
+        if concise:
+            concise(f""" Simulation Parameters:
 
             General
                 number of turtles       = {self.turtles}
@@ -235,63 +334,64 @@ class BarrioTortugaSEIR(Model):
             """)
 
         # Data collector
-        if CALIB:
-            self.datacollector          = DataCollector(
-            model_reporters             = {"NumberOfneighbors": number_of_turtles_in_neighborhood}
-
+        if calib:
+            self.datacollector          = ArrayCollector(
+            model_reporters             = {"NumberOfneighbors": number_of_turtles_in_neighborhood},
+            steps = expected_steps, every = collect_every
             )
         else:
-            self.datacollector          = DataCollector(
+            self.datacollector          = ArrayCollector(
             model_reporters             = {"NumberOfInfected": number_of_infected,
                                            "NumberOfSusceptible": number_of_susceptible,
                                            "NumberOfRecovered": number_of_recovered,
-                                           "NumberOfExposed": number_of_exposed}
+                                           "NumberOfExposed": number_of_exposed},
+            steps = expected_steps, every = collect_every, dtype = np.int64
             )
 
 
+        # homes and their doors
+        if self.map_bt is not None:
+            self.init_homes(nd, home_size)
+
         # Create turtles
-        if CALIB:  # only susceptible agents
+        if calib:  # only susceptible agents
             for i in range(self.turtles):
-                x,y = self.random_pos()           # random position
-                a = SeirTurtle(i, (x, y), 'S', ti, tr, 1, self)
+                x,y = self.start_pos(i)
+                a = SeirTurtle(i, (x, y), S, ti, tr, 1, self)
                 self.schedule.add(a)              # add to schedule
                 self.grid.place_agent(a, (x, y))  # added to schedule
 
         else:
             ss = self.turtles - i0            # number of susceptibles
-            A = ss * ['S'] + i0 * ['I']
+            A = ss * [S] + i0 * [I]
             np.random.shuffle(A)              # in random order
 
             for i, at in enumerate(A):
-                x,y = self.random_pos()           # random position
-                ti = get_time(self.ti_dist, self.ti)
-                #print(f'from exp  ti ={ti}')
-                tr = get_time(self.tr_dist, self.tr)
+                x,y = self.start_pos(i)
+                ti = self.ti_sampler()
+                tr = self.tr_sampler()
                 p  = self.get_prob()
                 self.Ti.append(ti)
                 self.Tr.append(tr)
                 self.P.append(p)
 
-                if print_level(prtl, PrtLvl.Concise):
-                    if i < 5:
-                        print (f' creating turtle number {i} with ti = {ti}, tr = {tr}, p ={p:.2e}')
+                if concise and i < 5:
+                    concise(f' creating turtle number {i} with ti = {ti}, tr = {tr}, p ={p:.2e}')
 
-                if at == 'I':
-                    if print_level(prtl, PrtLvl.Concise):
-                        if i < 5:
-                            print (f' creating I turtle')
+                if at == I:
+                    if concise and i < 5:
+                        concise(' creating I turtle')
 
-                    a = SeirTurtle(i, (x, y), 'I',
+                    a = SeirTurtle(i, (x, y), I,
                                    ti * ticks_per_day,
                                    tr * ticks_per_day, p,
                                    self)
 
                 else:
-                    if print_level(prtl, PrtLvl.Concise):
-                        if i < 5:
-                            print (f' creating S turtle')
+                    if concise and i < 5:
+                        concise(' creating S turtle')
 
-                    a = SeirTurtle(i, (x, y), 'S',
+                    a = SeirTurtle(i, (x, y), S,
                                    ti * ticks_per_day,
                                    tr * ticks_per_day, p,
                                    self)
@@ -299,22 +399,137 @@ class BarrioTortugaSEIR(Model):
                 self.schedule.add(a)              # add to schedule
                 self.grid.place_agent(a, (x, y))  # added to schedule
 
+        # transmission tree
+        self.infector       = np.full(self.turtles, -1, dtype=np.int64)
+        self.infection_tick = np.full(self.turtles, -1, dtype=np.int64)
+        for a in self.schedule.agents:
+            if a.kind == I:
+                self.infection_tick[a.unique_id] = 0
+
+        # kinds by turtle id, kept by SeirTurtle.set_kind
+        self.by_id     = self.turtles_by_id()
+        self.kind_code = np.array([a.kind for a in self.by_id], dtype=np.int8)
+
+        self.recorder = None
+        if record is not None:
+            self.recorder = TrajectoryRecorder(record, self.turtles, self.width, self.height,
+                                               record_stride)
+            self.recorder.initial([a.kind for a in self.turtles_by_id()])
+            self.record_positions()
+
         self.running = True
         self.datacollector.collect(self)
 
 
+    def init_homes(self, nd, home_size):
+        """Put the turtles in homes of home_size, each home with a random door"""
+        doors  = get_doors(self.map_bt, nd)
+        nhomes = -(-self.turtles // home_size)
+        self.home      = np.random.permutation(self.turtles) // home_size   # home of each turtle
+        self.home_door = [doors[d] for d in np.random.randint(len(doors), size=nhomes)]
+
+        H = sparse.csr_matrix((np.ones(self.turtles), (np.arange(self.turtles), self.home)),
+                              shape=(self.turtles, nhomes))
+        M = (H @ H.T).tocsr()
+        M.setdiag(0)
+        M.eliminate_zeros()
+        self.household = M
+
+
+    def start_pos(self, i):
+        """Initial position of turtle i: the door of its home, or random without map"""
+        if self.map_bt is None:
+            return self.random_pos()
+        return self.home_door[self.home[i]]
+
+
+    def household_infection(self):
+        """Each infectious turtle infects each of its susceptible housemates with probability p_home"""
+        t = self.schedule.steps - 1      # the tick just stepped
+        infectious = (self.kind_code == I).astype(np.float64)
+        n = self.household @ infectious  # infectious housemates of every turtle
+        s = np.flatnonzero((self.kind_code == S) & (n > 0))
+        new = s[np.random.random_sample(len(s)) < -np.expm1(n[s] * np.log1p(-self.p_home))]
+
+        M = self.household
+        for i in new:
+            mates = M.indices[M.indptr[i]:M.indptr[i + 1]]
+            infector = np.random.choice(mates[infectious[mates] > 0])
+            self.by_id[i].exposed(t, int(infector))
+
+
+    def turtles_by_id(self):
+        return sorted(self.schedule.agents, key=lambda a: a.unique_id)
+
+
+    def record_positions(self):
+        t = self.schedule.steps
+        if t % self.recorder.stride == 0:
+            xy = np.array([a.pos for a in self.turtles_by_id()]).T
+            self.recorder.positions(t, xy[0], xy[1])
+
+
+    def close_recorder(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+
     def get_prob(self):
         if self.p_dist == 'S' or self.p_dist == 'P':
-            r0  = c19_nbinom_rvs(self.r0, self.k) # self.k decided which one
+            r0  = self.r0_sampler()   # self.k decided which one
             p   = r0 /(self.nc * self.tr * self.ticks_per_day)
         else:
             p = self.p
         return p
 
 
+    def aggregate_infection(self):
+        """Infect the susceptibles of the cells above the hybrid prevalence as counts"""
+        self.aggregated = self.hot_zone = None
+        infectious = np.flatnonzero(self.kind_code == I)
+        if len(infectious) == 0:
+            return
+        t    = self.schedule.steps
+        W, H = self.grid.width, self.grid.height
+        xy   = np.array([a.pos for a in self.by_id])
+        x, y = xy[:, 0], xy[:, 1]
+        cell = y * W + x
+        n  = moore_sum(np.bincount(cell, minlength=W * H).reshape(H, W))
+        ni = moore_sum(np.bincount(cell[infectious], minlength=W * H).reshape(H, W))
+        hot = ni > self.hybrid * n
+        if not hot.any():
+            return
+
+        p = np.array([a.p for a in self.by_id])
+        L = np.bincount(cell[infectious], weights=log_escape(p[infectious]), minlength=W * H)
+        L = moore_sum(L.reshape(H, W)).ravel()
+        hot = hot.ravel()
+        s = np.flatnonzero((self.kind_code == S) & hot[cell])
+
+        # a binomial number of new exposed per cell, the first ones of its susceptibles shuffled
+        s  = s[np.lexsort((np.random.random_sample(len(s)), cell[s]))]
+        sc = cell[s]
+        ns = np.bincount(sc, minlength=W * H)
+        k  = np.random.binomial(ns, -np.expm1(L))
+        rank = np.arange(len(s)) - (np.cumsum(ns) - ns)[sc]
+        new  = s[rank < k[sc]]
+        for i, j in zip(new, choose_infectors(x, y, p, new, infectious, W, H, self.rng)):
+            self.by_id[i].exposed(t, int(j))
+
+        self.aggregated = np.zeros(self.turtles, dtype=bool)
+        self.aggregated[s] = True
+        self.hot_zone = (moore_sum(hot.reshape(H, W).astype(np.int64)) == 9).ravel()
+
+
     def step(self):
+        if self.hybrid is not None:
+            self.aggregate_infection()
         self.schedule.step()               # step all turtles
+        if self.p_home > 0 and self.map_bt is not None:
+            self.household_infection()
         self.datacollector.collect(self)
+        if self.recorder is not None:
+            self.record_positions()
 
 
     def random_pos(self):
@@ -325,18 +540,20 @@ class BarrioTortugaSEIR(Model):
 
     def number_of_agents(self, kind):
         if kind == 'A':
-            a =[agent for agent in self.schedule.agents]
-        else:
-            a =[agent for agent in self.schedule.agents if agent.kind==kind]
-        return len(a)
+            return len(self.schedule.agents)
+        return int(np.count_nonzero(self.kind_code == KINDS.index(kind)))
 
 
-class SeirTurtle(Agent):
+class SeirTurtle(SlotAgent):
     '''
     Class implementing a SEIR turtle that can move at random
 
+    kind is the code of the kind (S, E, I, R = 0, 1, 2, 3, Kind(kind).name is
+    the letter). The attributes are slots (see abmkit.agent).
     '''
 
+    __slots__ = ('p', 'kind', 'ti', 'tr', 'il', 'iil', 'iel')
+
     def __init__(self, unique_id, pos, kind, ti, tr, prob, model):
         '''
         grid: The MultiGrid object in which the agent lives.
@@ -355,107 +572,110 @@ class SeirTurtle(Agent):
         self.iel  = 0           # infection length
 
 
+    def set_kind(self, kind):
+        self.kind = kind
+        self.model.kind_code[self.unique_id] = kind
+
+
+    def exposed(self, tick, infector):
+        """Turn S into E at tick, infected by turtle infector"""
+        self.set_kind(E)
+        self.iel = tick   # tag = infection time
+        self.model.infector[self.unique_id]       = infector
+        self.model.infection_tick[self.unique_id] = tick
+        if self.model.recorder is not None:
+            self.model.recorder.event(self.unique_id, tick, S, E, infector)
+
+
     def step(self):
         self.il+=1
+        detailed = self.model.diag.detailed
+        tick     = self.model.schedule.steps
 
         # Turtle became exposed with tag self.iel (see infect ())
-        if self.kind == 'E' :
-        #and self.model.schedule.steps > self.iel:
-
-            if print_level(prtl, PrtLvl.Detailed):
-                    print(f"""Found exposed with tag = {self.iel}
-                          global time = {self.model.schedule.steps}
-                          turtle id   = {self.unique_id}
-                """)
+        if self.kind == E:
+            if detailed:
+                detailed('Found exposed', tag=self.iel, time=tick, turtle=self.unique_id)
 
             # When time is larger than incubation time, become infected
-            if self.model.schedule.steps - self.iel > self.ti :
-                self.iil = self.model.schedule.steps
-                self.kind = 'I'
+            if tick - self.iel > self.ti :
+                self.iil = tick
+                self.set_kind(I)
+                if self.model.recorder is not None:
+                    self.model.recorder.event(self.unique_id, self.iil, E, I)
 
-                if print_level(prtl, PrtLvl.Detailed):
-                    print(f"""Turning E into I with tag = {self.iil}
-                          global time = {self.model.schedule.steps}
-                          turtle id   = {self.unique_id}
-                """)
+                if detailed:
+                    detailed('Turning E into I', tag=self.iil, time=tick, turtle=self.unique_id)
 
-        elif self.kind == 'I':
+        elif self.kind == I:
             self.infect()
 
-            if print_level(prtl, PrtLvl.Detailed):
-                print(f"""Found Infected with tag = {self.iil}
-                          global time = {self.model.schedule.steps}
-                          turtle id   = {self.unique_id}
-                          **going to infect***
-                """)
+            if detailed:
+                detailed('Found Infected', tag=self.iil, time=tick, turtle=self.unique_id)
 
             # When time is larger than recovery time, become recovered
-            if self.model.schedule.steps - self.iil >  self.tr :
-                self.kind = 'R'
+            if tick - self.iil >  self.tr :
+                self.set_kind(R)
+                if self.model.recorder is not None:
+                    self.model.recorder.event(self.unique_id, tick, I, R)
 
-                if print_level(prtl, PrtLvl.Detailed):
-                    print(f"""Turning I into R with tag = {self.iil}
-                          global time = {self.model.schedule.steps}
-                          turtle id   = {self.unique_id}
-                """)
+                if detailed:
+                    detailed('Turning I into R', tag=self.iil, time=tick, turtle=self.unique_id)
 
         self.random_move()
 
     def infect(self):
-        if print_level(prtl, PrtLvl.Verbose):
-                print(f"""Now infecting with tags  {self.iil}
-                          global time = {self.model.schedule.steps}
-                          turtle id   = {self.unique_id}
+        # tracers fetched once: None (a single test) unless the level is on
+        detailed = self.model.diag.detailed
+        verbose  = self.model.diag.verbose
+        if verbose:
+            verbose('Now infecting', tag=self.iil, time=self.model.schedule.steps,
+                    turtle=self.unique_id)
+
+        # in hybrid mode, the aggregated cells are infected as counts
+        aggregated = self.model.aggregated
+        if aggregated is not None:
+            x, y = self.pos
+            if self.model.hot_zone[y * self.model.grid.width + x]:
+                return
 
-                """)
         # array of coordinates ((x0,y0), (x1,y1), (x2, y2),...) of neighbors
         # last parameter True inludes own cell
         n_xy = self.model.grid.get_neighborhood(self.pos, self.model.moore, True)
 
-        if print_level(prtl, PrtLvl.Verbose):
-                print(f'coordinates of neighbors, including me = {n_xy}')
+        if verbose:
+            verbose('coordinates of neighbors, including me', cells=n_xy)
 
         for xy in n_xy:   # loops over all cells
-            if print_level(prtl, PrtLvl.Verbose):
-                    print(f'neighbors = {xy}')
-
             cell = self.model.grid.get_cell_list_contents(xy)
             turtles = [obj for obj in cell if isinstance(obj, type(self))]
 
-            if print_level(prtl, PrtLvl.Verbose):
-                print(f' number of turtles = {len(turtles)}')
+            if verbose:
+                verbose('neighbors', cell=xy, turtles=len(turtles))
 
             for turtle in turtles:  # loops over all turtles in cells
 
-                if print_level(prtl, PrtLvl.Verbose):
-                    print(f' turtle kind = {turtle.kind}')
+                if verbose:
+                    verbose('turtle', turtle=turtle.unique_id, kind=KINDS[turtle.kind])
 
-                if turtle.kind == 'S':  # if susceptible found try to infect
-                    if print_level(prtl, PrtLvl.Verbose):
-                        print(f' throwing dice')
+                # if susceptible found (and not infected as counts) try to infect
+                if turtle.kind == S and (aggregated is None or not aggregated[turtle.unique_id]):
+                    if verbose:
+                        verbose('throwing dice', turtle=turtle.unique_id, p=self.p)
 
                     if throw_dice(self.p):
-                        turtle.kind = 'E'
-                        turtle.iel = self.model.schedule.steps # tag = infection time
-
-                        if print_level(prtl, PrtLvl.Detailed):
-                            print(f' **TURNING TURTLE INTO E ** ')
-                            print(f"""tag  {turtle.iel}
-                                      global time = {self.model.schedule.steps}
-                                      turtle id   = {turtle.unique_id}
+                        turtle.exposed(self.model.schedule.steps, self.unique_id)
 
-                            """)
+                        if detailed:
+                            detailed('TURNING TURTLE INTO E', tag=turtle.iel,
+                                     time=self.model.schedule.steps, turtle=turtle.unique_id)
 
     def random_move(self):
         '''
-        Step one cell in any allowable direction.
-        We use grid’s built-in get_neighborhood method, which returns all the neighbors of a given cell.
-        This method can get two types of cell neighborhoods: Moore (including diagonals),
-        and Von Neumann (only up/down/left/right).
-        It also needs an argument as to whether to include the center cell itself as one of the neighbors.
+        Step one cell in any allowable direction (only streets if the model has a map),
+        own cell included. The neighbourhoods are cached by abmkit.walkers.
+        With model mobility < 1 the turtle stays put with probability 1 - mobility.
         '''
-        # Pick the next cell from the adjacent cells.
-        next_moves = self.model.grid.get_neighborhood(self.pos, self.model.moore, True)
-        next_move = self.random.choice(next_moves)
-        # Now move:
-        self.model.grid.move_agent(self, next_move)
+        if self.model.mobility < 1 and self.random.random() >= self.model.mobility:
+            return
+        walkers.random_move(self, self.model.moore, self.model.walkable)
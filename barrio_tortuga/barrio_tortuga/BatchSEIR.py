@@ -0,0 +1,222 @@
+"""
+Replica batched version of ArraySEIR.
+
+R independent replicas of the same model are advanced together: every turtle
+state array of ArraySEIR gets a leading replica axis (R x turtles), and a tick
+is the same handful of array operations as in ArraySEIR applied to all the
+replicas at once. The per cell infection pressure is computed for all the
+replicas with a single bincount over (replica, cell) pairs.
+
+Each replica draws its random numbers from its own Generator (spawned from
+seed), so a replica does not depend on how many others run with it. Dice
+are thrown for every turtle (not only the susceptible ones), so replicas are
+not draw for draw those of ArraySEIR, but follow the same dynamics. The
+transmission tree is not kept.
+
+With reorder = n > 0 the turtles of every replica are sorted every n ticks
+by the Morton index of their cell (abmkit.morton, see ArraySEIR); stats()
+still lists them by turtle id.
+
+run_batched returns the runs and stats arrays of ensemble.run_ensemble;
+frames() the per replica DataFrames of the datacollector.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from abmkit.morton import morton_key
+
+from . ArraySEIR import S, E, I, R, get_times, log_escape
+from . columns import COLUMNS
+from . stats import c19_nbinom_transform
+
+
+def batch_moore_sum(L):
+    """Sum of each cell and its 8 neighbours, over the last two (torus) axes"""
+    Ly = L + np.roll(L, 1, axis=-2) + np.roll(L, -1, axis=-2)
+    return Ly + np.roll(Ly, 1, axis=-1) + np.roll(Ly, -1, axis=-1)
+
+
+class BatchSEIR:
+    """replicas independent runs of ArraySEIR with the given parameters"""
+
+    def __init__(self,
+                 replicas      =   10,
+                 ticks_per_day =    5,
+                 turtles       = 1000,
+                 i0            =   10,
+                 r0            =    3.5,
+                 ti            =    5.5,
+                 tr            =    3.5,
+                 ti_dist       =    'F',    # F for fixed, E for exp G for Gamma
+                 tr_dist       =    'F',
+                 p_dist        =    'F',    # F for fixed, S for Binomial, P for Poissoin
+                 width         =   40,
+                 height        =   40,
+                 nc_factor     =    1,
+                 k             = None,
+                 reorder       =    0,      # ticks between Morton sorts of the turtles, 0 for never
+                 expected_steps =  500,     # sizes the count buffer
+                 seed          = None):
+
+        self.replicas      = replicas
+        self.ticks_per_day = ticks_per_day
+        self.turtles       = turtles
+        self.i0            = i0
+        self.r0            = r0
+        self.ti            = ti
+        self.tr            = tr
+        self.ti_dist       = ti_dist
+        self.tr_dist       = tr_dist
+        self.p_dist        = p_dist
+        self.width         = width
+        self.height        = height
+        self.reorder       = reorder
+        self.steps         = 0
+
+        self.nc = nc_factor * 9 * turtles / (width * height)
+        self.k  = 1
+        if   p_dist == 'S':
+            self.k = 0.16
+        elif p_dist == 'P':
+            self.k = 1e+4
+        if k is not None:
+            self.k = k
+        self.p = r0 /(self.nc * tr * ticks_per_day)
+
+        self.rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(replicas)]
+
+        # turtle state, one row per replica
+        shape = (replicas, turtles)
+        self.ids  = np.broadcast_to(np.arange(turtles, dtype=np.int32), shape).copy()
+        self.x    = np.empty(shape, dtype=np.int32)
+        self.y    = np.empty(shape, dtype=np.int32)
+        self.kind = np.full(shape, S, dtype=np.int8)
+        self.Ti   = np.empty(shape)
+        self.Tr   = np.empty(shape)
+        self.P    = np.full(shape, self.p)
+        for r, rng in enumerate(self.rngs):
+            self.x[r] = rng.integers(width, size=turtles)
+            self.y[r] = rng.integers(height, size=turtles)
+            self.kind[r, rng.choice(turtles, size=i0, replace=False)] = I
+            self.Ti[r] = get_times(ti_dist, ti, turtles, rng)
+            self.Tr[r] = get_times(tr_dist, tr, turtles, rng)
+            if p_dist == 'S' or p_dist == 'P':
+                nb, pb = c19_nbinom_transform(r0, self.k)
+                self.P[r] = rng.negative_binomial(nb, pb, turtles) / (self.nc * tr * ticks_per_day)
+        self.tti = self.Ti * ticks_per_day
+        self.ttr = self.Tr * ticks_per_day
+        self.iel = np.zeros(shape, dtype=np.int32)
+        self.iil = np.zeros(shape, dtype=np.int32)
+        self.logq = log_escape(self.P)
+
+        # offset of each replica in the (replica, cell) bins
+        self.cell_offset = (np.arange(replicas, dtype=np.int64) * width * height)[:, None]
+
+        # buffers refilled every tick from the replica streams
+        self.u = np.empty(shape)
+        self.d = np.empty((replicas, 2, turtles), dtype=np.int8)
+
+        # counts[t, r] = S, E, I, R of replica r at tick t
+        self.counts = np.zeros((expected_steps + 1, replicas, 4), dtype=np.int64)
+        self.collect()
+
+
+    def reorder_turtles(self):
+        """Sort the turtles of every replica by the Morton index of their cell"""
+        order = np.argsort(morton_key(self.x, self.y), axis=1, kind='stable')
+        for name in ('ids', 'x', 'y', 'kind', 'Ti', 'Tr', 'P', 'tti', 'ttr', 'iel', 'iil', 'logq'):
+            setattr(self, name, np.take_along_axis(getattr(self, name), order, axis=1))
+
+
+    def cell(self):
+        """Index of the cell of every turtle in the (replica, cell) bins"""
+        return self.y * self.width + self.x + self.cell_offset
+
+
+    def collect(self):
+        if self.steps == len(self.counts):
+            counts = np.zeros((2 * len(self.counts), self.replicas, 4), dtype=np.int64)
+            counts[:self.steps] = self.counts
+            self.counts = counts
+        for k in (S, E, I, R):
+            self.counts[self.steps, :, k] = (self.kind == k).sum(axis=1)
+
+
+    def draw(self):
+        """Refill the dice and move buffers, each row from the replica's own stream"""
+        for r, rng in enumerate(self.rngs):
+            rng.random(out=self.u[r])
+            self.d[r] = rng.integers(-1, 2, size=(2, self.turtles), dtype=np.int8)
+
+
+    def step(self):
+        t = self.steps
+        if self.reorder and t % self.reorder == 0:
+            self.reorder_turtles()
+        infectious = self.kind == I
+
+        # When time is larger than incubation time, become infected
+        turn = (self.kind == E) & (t - self.iel > self.tti)
+        self.kind[turn] = I
+        self.iil[turn]  = t
+
+        # infect susceptibles around infectious turtles
+        self.draw()
+        cell = self.cell().ravel()
+        H, W = self.height, self.width
+        L = np.bincount(cell[infectious.ravel()], weights=self.logq[infectious],
+                        minlength=self.replicas * H * W)
+        pinf = -np.expm1(batch_moore_sum(L.reshape(self.replicas, H, W))).ravel()
+        new = (self.kind == S) & (self.u < pinf[cell].reshape(self.replicas, -1))
+        self.kind[new] = E
+        self.iel[new]  = t
+
+        # When time is larger than recovery time, become recovered
+        recover = infectious & (t - self.iil > self.ttr)
+        self.kind[recover] = R
+
+        # random move in the Moore neighbourhood, as abmkit.walkers.bulk_move
+        self.x += self.d[:, 0]
+        self.x %= W
+        self.y += self.d[:, 1]
+        self.y %= H
+
+        self.steps += 1
+        self.collect()
+
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+
+
+    def runs(self):
+        """(replicas x steps+1 x 4) counts in ensemble.COLUMNS order"""
+        return self.counts[:self.steps + 1][:, :, [I, S, R, E]].transpose(1, 0, 2)
+
+
+    def frames(self):
+        """One datacollector DataFrame per replica"""
+        return [pd.DataFrame(r, columns=COLUMNS) for r in self.runs()]
+
+
+    def stats(self):
+        """(replicas x turtles x 3) Ti, Tr and P of every turtle, in ensemble.STATS order"""
+        rows = np.argsort(self.ids, axis=1)
+        return np.stack([np.take_along_axis(a, rows, axis=1) for a in (self.Ti, self.Tr, self.P)],
+                        axis=-1)
+
+
+def run_batched(ns=10, steps=500, seed=None, path=None, **params):
+    """Batched counterpart of ensemble.run_ensemble: returns the runs and stats arrays.
+    If path is given they are also written there as runs.npy and stats.npy."""
+    bt = BatchSEIR(replicas=ns, expected_steps=steps, seed=seed, **params)
+    bt.run(steps)
+    runs, stats = bt.runs(), bt.stats()
+    if path is not None:
+        np.save(os.path.join(path, 'runs.npy'), runs)
+        np.save(os.path.join(path, 'stats.npy'), stats)
+    return runs, stats
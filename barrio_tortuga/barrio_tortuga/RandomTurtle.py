@@ -1,4 +1,8 @@
-class WalkingAgent(Agent):
+from abmkit import walkers
+from abmkit.agent import SlotAgent
+
+
+class WalkingAgent(SlotAgent):
     '''
     Class implementing a turtle that can move at random
 
@@ -7,6 +11,8 @@ class WalkingAgent(Agent):
 
     '''
 
+    __slots__ = ('moore',)
+
     def __init__(self, unique_id, pos, model, moore=True):
         '''
         grid: The MultiGrid object in which the agent lives.
@@ -22,16 +28,10 @@ class WalkingAgent(Agent):
     def random_move(self):
         '''
         Step one cell in any allowable direction.
-        We use grid’s built-in get_neighborhood method, which returns all the neighbors of a given cell.
-        This method can get two types of cell neighborhoods: Moore (including diagonals),
-        and Von Neumann (only up/down/left/right).
-        It also needs an argument as to whether to include the center cell itself as one of the neighbors.
+        Moore (including diagonals) or Von Neumann (only up/down/left/right)
+        neighbourhood, the own cell included (see abmkit.walkers).
         '''
-        # Pick the next cell from the adjacent cells.
-        next_moves = self.model.grid.get_neighborhood(self.pos, self.moore, True)
-        next_move = self.random.choice(next_moves)
-        # Now move:
-        self.model.grid.move_agent(self, next_move)
+        walkers.random_move(self, self.moore)
 
 
 class RandomTurtle(WalkingAgent):
@@ -39,5 +39,7 @@ class RandomTurtle(WalkingAgent):
     Agent which only walks around.
     '''
 
+    __slots__ = ()
+
     def step(self):
         self.random_move()
@@ -19,27 +19,15 @@ A turtle which has a hot spot patch as a neighbour has a probability ph to stay
 
 from mesa import Model
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
-from mesa import Agent
 from mesa.time import RandomActivation
 import numpy as np
 
-from enum import Enum
-class PrtLvl(Enum):
-    Mute     = 1
-    Concise  = 2
-    Detailed = 3
-    Verbose  = 4
+from abmkit.collector import ArrayCollector
+from abmkit import walkers
+from abmkit.agent import SlotAgent
+from abmkit.diagnostics import Diagnostics, PrtLvl
 
-
-def print_level(prtl, PRT):
-    if prtl.value >= PRT.value:
-        return True
-    else:
-        return False
-
-
-prtl =PrtLvl.Concise
+from . BarrioTortuga import get_doors
 
 
 def is_courridor(map_bt, x, y):
@@ -67,7 +55,7 @@ def is_payment(map_bt, x, y):
         return False
 ### AGENTS
 
-class Patch(Agent):
+class Patch(SlotAgent):
     """
     A supermarket patch.
     kind = 1 means the patch belongs to a wall
@@ -75,6 +63,8 @@ class Patch(Agent):
     kind = 3 means the patch belongs to a hot spot
     kind = 4 means the patch belongs to payment booth
     """
+    __slots__ = ('kind', 'moore')
+
     def __init__(self, unique_id, pos, model, kind, moore=False):
         super().__init__(unique_id, model)
         self.kind = kind
@@ -85,10 +75,12 @@ class Patch(Agent):
         pass
 
 
-class Turtle(Agent):
+class Turtle(SlotAgent):
     '''
     A turtle able to move in streets
     '''
+    __slots__ = ('moore',)
+
     def __init__(self, unique_id, pos, model, moore=True):
         super().__init__(unique_id, model)
         self.pos = pos
@@ -119,43 +111,14 @@ class Turtle(Agent):
             return False
 
     def move(self):
-        # Get neighborhood
-        neighbors = [i for i in self.model.grid.get_neighborhood(self.pos, self.moore,
-                False)]
-
-        allowed_neighbors = []
-        for pos in neighbors:
-            if self.check_if_in_street(pos):
-                allowed_neighbors.append(pos)
-
-        selected_neighbors = []
-
-        if self.model.social_affinity == 0:  # just move at random
-            selected_neighbors = allowed_neighbors
-        elif self.model.social_affinity > 0:  # Try to move into an occupied cell if you can
-            for pos in allowed_neighbors:
-                n_cell = self.model.grid.get_cell_list_contents([pos])
-                if self.filled_with_turtles(n_cell) == True:
-                    if self.socialize_turtle() == True:  # pass test
-                        selected_neighbors.append(pos)   # select spot as candidate
-
-            if len(selected_neighbors) == 0:  # no spot with another turtle
-                selected_neighbors = allowed_neighbors # thus move at random to available
-
-        elif self.model.social_affinity < 0:  # Try to avoid occupied cells if you can
-            for pos in allowed_neighbors:
-                n_cell = self.model.grid.get_cell_list_contents([pos])
-                if self.filled_with_turtles(n_cell) == True:
-                    if self.avoid_turtle() == False:  # failed avoiding turtle
-                        selected_neighbors.append(pos)
-                else:
-                    selected_neighbors.append(pos) # this one is void, OK
-
-            if len(selected_neighbors) == 0:  # no spot are voids
-                selected_neighbors = allowed_neighbors # thus move at random to available
-
-        self.random.shuffle(selected_neighbors)
-        self.model.grid.move_agent(self, selected_neighbors[0])
+        '''
+        Step to a neighbouring walkable cell, seeking (social_affinity > 0) or
+        avoiding (social_affinity < 0) the cells with turtles (see abmkit.walkers).
+        '''
+        grid = self.model.grid
+        walkers.affinity_move(self, self.model.social_affinity,
+                              lambda pos: self.filled_with_turtles(grid.get_cell_list_contents([pos])),
+                              self.moore, self.model.walkable)
 
 
     def step(self):
@@ -165,18 +128,18 @@ class Turtle(Agent):
 # MODEL
 def number_of_encounters(model):
     nc = 0
+    verbose = model.diag.verbose
     for y in range(model.grid.height):
         for x in range(model.grid.width):
             this_cell = model.grid.get_cell_list_contents((x,y))
             n_turtles = len([obj for obj in this_cell if isinstance(obj, Turtle)])
-            if n_turtles > 0:
-                if print_level(prtl, PrtLvl.Verbose):
-                    print(f'number of turtles found in {x,y} -->{ n_turtles}')
+            if verbose and n_turtles > 0:
+                verbose(f'number of turtles found in {x,y} -->{ n_turtles}')
             if n_turtles > 1:
                 nc += 1
 
-    if print_level(prtl, PrtLvl.Detailed):
-        print(f'total number of encounters this step ={nc}')
+    if model.diag.detailed:
+        model.diag.detailed(f'total number of encounters this step ={nc}')
     return nc
 
 def number_of_turtles_in_neighborhood(model):
@@ -204,7 +167,8 @@ class BarrioTortuga(Model):
                  turtles=250,
                  social_affinity = 0.,
                  nd=2,
-                 prtl=PrtLvl.Detailed):
+                 prtl=PrtLvl.Detailed,
+                 logger=None):
         '''
         Create a new Barrio Tortuga.
 
@@ -228,19 +192,24 @@ class BarrioTortuga(Model):
             always moves to its cell. A social affinity of -1 means that a turtle always tries
             to avoid any turtle nearby.
             nd, a parameter that decides the number of doors (largest for nd=1)
+            prtl, the print level, and logger, a logging.Logger for the messages
+            (stdout by default), see abmkit.diagnostics
         '''
 
         # read the map
         self.map_bt                 = np.genfromtxt(map_file)
+        self.walkable               = self.map_bt != 1   # cells turtles can walk
         self.social_affinity        = social_affinity
         self.avoid_awareness        = -social_affinity
 
-        if print_level(prtl, PrtLvl.Concise):
-            print(f'loaded barrio tortuga map with dimensions ->{ self.map_bt.shape}')
+        self.diag = Diagnostics(prtl, logger)
+        concise, detailed = self.diag.concise, self.diag.detailed
+        if concise:
+            concise(f'loaded barrio tortuga map with dimensions ->{ self.map_bt.shape}')
             if self.social_affinity >= 0:
-                print(f'social affinity ->{ self.social_affinity}')
+                concise(f'social affinity ->{ self.social_affinity}')
             else:
-                print(f'avoid awareness ->{ self.avoid_awareness}')
+                concise(f'avoid awareness ->{ self.avoid_awareness}')
 
 
         self.height, self.width     = self.map_bt.shape
@@ -248,8 +217,9 @@ class BarrioTortuga(Model):
         self.moore                  = True
         self.turtles                = turtles
         self.schedule               = RandomActivation(self)
-        self.datacollector          = DataCollector(
-        model_reporters             = {"NumberOfEncounters": number_of_encounters}
+        self.datacollector          = ArrayCollector(
+        model_reporters             = {"NumberOfEncounters": number_of_encounters},
+        dtype                       = np.int64
         )
 
         # create the patches representing houses and avenues
@@ -262,20 +232,20 @@ class BarrioTortuga(Model):
 
         # Create turtles distributed randomly in the doors
         doors = self.get_doors(nd)
-        if print_level(prtl, PrtLvl.Detailed):
-            print(f'doors = {doors}')
+        if detailed:
+            detailed(f'doors = {doors}')
 
         n_doors = len(doors)
-        if print_level(prtl, PrtLvl.Concise):
-            print(f'number of doors = {n_doors}')
+        if concise:
+            concise(f'number of doors = {n_doors}')
 
         for i in range(int(self.turtles)):
             n = self.random.randrange(n_doors)  # choose the door
             d = doors[n]
             x=  d[0]
             y = d[1]                    # position of the door
-            if print_level(prtl, PrtLvl.Detailed):
-                print(f'starting turtle {i} at door number {n}, x,y ={x,y}')
+            if detailed:
+                detailed(f'starting turtle {i} at door number {n}, x,y ={x,y}')
 
             a = Turtle(i, (x, y), self, True)  # create Turtle
 
@@ -292,9 +262,4 @@ class BarrioTortuga(Model):
 
 
     def get_doors(self, nd):
-        l,w = self.map_bt.shape
-        D = []
-        if nd == 1:
-            return [(x,y) for x in range(l) for y in range(w) if is_house(self.map_bt, x, y) == False and is_house(self.map_bt, x, y-1) == True]
-        else:
-            return [(x,y) for x in range(l) for y in range(w) if is_house(self.map_bt, x, y) == False and is_house(self.map_bt, x-1, y-1) == True]
+        return get_doors(self.map_bt, nd)
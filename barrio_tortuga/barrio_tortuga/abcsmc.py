@@ -0,0 +1,165 @@
+"""
+Approximate Bayesian computation (ABC-SMC) of the SEIR parameters.
+
+Fits a subset of the model parameters (typically r0, ti, tr and k) to an
+observed series of infected, one value per tick, with the sequential Monte
+Carlo scheme of Toni et al. / Beaumont et al.:
+
+    generation 0 : particles drawn from the (uniform) prior.
+    generation t : particles drawn from the weighted population t-1, moved by
+                   a Gaussian kernel with twice its covariance, and accepted
+                   if their distance to the data is below eps_t, the alpha
+                   quantile of the distances accepted in generation t-1.
+
+The distance is the root mean square difference between the simulated and
+observed NumberOfInfected. Its sum of squares only grows as the run goes on,
+so a simulation is stopped as soon as it exceeds eps_t^2 x length: most of
+the rejected particles cost a fraction of a full run.
+
+Particles are simulated in a process pool. Each generation is saved in
+path/population_<t>.npz as soon as it is complete, and abc_smc resumes from
+the last saved generation, so a long fit can be interrupted and continued.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from . BarrioTortugaSEIR import BarrioTortugaSEIR
+from . ensemble import seeded_model
+
+
+def simulate_distance(model, names, theta, params, observed, eps, seed):
+    """Distance of one simulation at theta to observed, np.inf if it goes over eps.
+    Returns the distance and the number of ticks simulated.
+    """
+    bt = seeded_model(model, seed, **dict(params, **dict(zip(names, theta))))
+
+    n     = len(observed)
+    limit = eps**2 * n
+    sse   = (bt.number_of_agents('I') - observed[0])**2
+    for t in range(1, n):
+        bt.step()
+        sse += (bt.number_of_agents('I') - observed[t])**2
+        if sse > limit:
+            return np.inf, t
+    return np.sqrt(sse / n), n - 1
+
+
+def save_population(path, t, pop):
+    np.savez(os.path.join(path, f'population_{t}.npz'), **pop)
+
+
+def load_population(path, t):
+    with np.load(os.path.join(path, f'population_{t}.npz')) as f:
+        return {key: f[key] for key in f.files}
+
+
+def saved_generations(path):
+    files = glob.glob(os.path.join(path, 'population_*.npz'))
+    return sorted(int(re.search(r'population_(\d+)\.npz$', f).group(1)) for f in files)
+
+
+def population_frame(pop):
+    """Particles of a population as a DataFrame, with their weight and distance"""
+    df = pd.DataFrame(pop['theta'], columns=[str(n) for n in pop['names']])
+    df['weight']   = pop['weights']
+    df['distance'] = pop['distance']
+    return df
+
+
+def abc_smc(observed,
+            prior,                    # {name: (low, high)} uniform priors
+            path,                     # directory where the populations are kept
+            generations = 5,
+            particles   = 200,
+            alpha       = 0.5,        # quantile of the distances setting the next eps
+            eps_min     = 0,          # stop when eps goes below
+            model       = BarrioTortugaSEIR,
+            processes   = None,       # worker processes, default number of cores
+            batch       = None,       # proposals submitted at a time
+            max_proposals = 100000,   # per generation
+            seed        = None,
+            **params):
+    """Run (or resume) the ABC-SMC fit of the prior parameters of
+    model(**params) to the observed NumberOfInfected series.
+
+    Returns the list of populations: dicts with names, theta (particles x
+    parameters), weights, distance, eps and the proposals and ticks simulated.
+    """
+    observed = np.asarray(observed, dtype=np.float64)
+    names = list(prior)
+    lo = np.array([prior[n][0] for n in names], dtype=np.float64)
+    hi = np.array([prior[n][1] for n in names], dtype=np.float64)
+    if 'k' in names and params.get('p_dist', 'F') == 'F':
+        params['p_dist'] = 'S'    # k only acts on the per turtle R0 distribution
+    os.makedirs(path, exist_ok=True)
+
+    done = saved_generations(path)
+    pops = [load_population(path, t) for t in done]
+    pool = ProcessPoolExecutor(processes) if processes != 1 else None
+    batch = batch or 4 * ((processes or os.cpu_count()) if pool is not None else 1)
+
+    def evaluate(thetas, eps, seeds):
+        args = [(model, names, th, params, observed, eps, int(s)) for th, s in zip(thetas, seeds)]
+        if pool is None:
+            return [simulate_distance(*a) for a in args]
+        return [f.result() for f in [pool.submit(simulate_distance, *a) for a in args]]
+
+    try:
+        for t in range(len(pops), generations):
+            rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(t,)))
+            if t == 0:
+                eps = np.inf
+            else:
+                prev = pops[-1]
+                eps  = np.quantile(prev['distance'], alpha)
+                cov  = 2 * np.atleast_2d(np.cov(prev['theta'], rowvar=False,
+                                                aweights=prev['weights']))
+                chol = np.linalg.cholesky(cov + 1e-12 * np.eye(len(names)))
+                icov = np.linalg.inv(cov + 1e-12 * np.eye(len(names)))
+            if eps < eps_min:
+                break
+
+            theta, dist = [], []
+            proposals = ticks = 0
+            while len(theta) < particles and proposals < max_proposals:
+                if t == 0:
+                    cand = lo + (hi - lo) * rng.random((batch, len(names)))
+                else:
+                    pick = rng.choice(len(prev['theta']), size=batch, p=prev['weights'])
+                    cand = prev['theta'][pick] + rng.standard_normal((batch, len(names))) @ chol.T
+                    cand = cand[np.all((cand >= lo) & (cand <= hi), axis=1)]
+                seeds = rng.integers(2**32, size=len(cand))
+                for th, (d, n) in zip(cand, evaluate(cand, eps, seeds)):
+                    ticks += n
+                    if d <= eps and len(theta) < particles:
+                        theta.append(th)
+                        dist.append(d)
+                proposals += len(cand)
+            if len(theta) < particles:
+                raise RuntimeError(f'generation {t}: only {len(theta)} particles accepted '
+                                   f'in {proposals} proposals at eps = {eps}')
+
+            theta = np.array(theta)
+            if t == 0:
+                weights = np.ones(len(theta))
+            else:
+                # w_i = prior(theta_i) / sum_j w_j K(theta_i | theta_j), the prior is flat
+                diff = theta[:, None, :] - prev['theta'][None, :, :]
+                K = np.exp(-0.5 * np.einsum('ijk,kl,ijl->ij', diff, icov, diff))
+                weights = 1 / (K @ prev['weights'])
+            weights /= weights.sum()
+
+            pop = dict(names=np.array(names), theta=theta, weights=weights,
+                       distance=np.array(dist), eps=eps, proposals=proposals, ticks=ticks)
+            save_population(path, t, pop)
+            pops.append(pop)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return pops
@@ -2,34 +2,203 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from . columns import COLUMNS
+
+# Stacked results: runs is a (replicas x steps x 4) array with the columns in
+# ensemble.COLUMNS order (the runs array of run_ensemble, or stack_frames of a
+# list of DataFrames). All the functions below work on every replica at once.
+
+CI, CS, CR, CE = range(len(COLUMNS))
+
+
+def stack_frames(dfts):
+    """Stack DataFrames of equal length (datacollector output) into a runs array"""
+    return np.stack([dft[list(COLUMNS)].values for dft in dfts])
+
+
+def population(runs):
+    """Number of turtles of every replica"""
+    return runs[:, 0].sum(axis=1)
+
+
+def r0_stack(runs, tmax=25, tr=5, ticks_per_day=5):
+    """R0 per tick for ticks 1 ... tmax-1, estimated from the new exposed
+    divided by S/N and I. Returns the ticks and a (replicas x ticks) array.
+    """
+    runs = np.asarray(runs, dtype=np.float64)
+    E = runs[:, :tmax, CE]
+    I = runs[:, :tmax, CI]
+    S = runs[:, :tmax, CS]
+    N = S[:, :1] + I[:, :1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r0 = np.diff(E, axis=1) / (S[:, :-1] / N) / I[:, :-1]
+    return np.arange(1, E.shape[1]), r0 * tr * ticks_per_day
+
+
+def peak_stack(runs, ticks_per_day=1, ticks=None):
+    """Time (in days) and height of the peak of infected of every replica.
+    ticks: tick of every row, if the series were decimated.
+    """
+    I = np.asarray(runs)[:, :, CI]
+    imax = I.argmax(axis=1)
+    ticks = np.arange(I.shape[1]) if ticks is None else np.asarray(ticks)
+    return ticks[imax] / ticks_per_day, I[np.arange(len(I)), imax]
+
+
+def attack_rate(runs):
+    """Fraction of the turtles infected by the end of every replica"""
+    runs = np.asarray(runs)
+    return 1 - runs[:, -1, CS] / population(runs)
+
+
+def epidemic_duration(runs, ticks_per_day=1, threshold=0):
+    """Days until the number of E + I turtles stays at or below threshold.
+    Replicas still active at the end of the run return the run length.
+    """
+    runs = np.asarray(runs)
+    active = (runs[:, :, CI] + runs[:, :, CE]) > threshold
+    last = active.shape[1] - 1 - active[:, ::-1].argmax(axis=1)
+    return np.where(active.any(axis=1), last + 1, 0) / ticks_per_day
+
+
+def bands(runs, column=CI, q=(0.05, 0.5, 0.95)):
+    """Quantiles q over the replicas of one column, a (len(q) x steps) array"""
+    return np.quantile(np.asarray(runs)[:, :, column], q, axis=0)
+
+
+def summary(runs, tmax=25, tr=5, ticks_per_day=5):
+    """One row per replica: mean R0, peak time and height, attack rate, duration"""
+    _, r0 = r0_stack(runs, tmax, tr, ticks_per_day)
+    tp, hp = peak_stack(runs, ticks_per_day)
+    return pd.DataFrame({'R0': np.nanmean(np.where(np.isfinite(r0), r0, np.nan), axis=1),
+                         'PeakTime': tp,
+                         'PeakHeight': hp,
+                         'AttackRate': attack_rate(runs),
+                         'Duration': epidemic_duration(runs, ticks_per_day)})
+
+
 def peak_position(dft, ticks_per_day=1):
-    return dft.NumberOfInfected.idxmax()/ticks_per_day, dft.NumberOfInfected.max()
+    t, h = peak_stack(stack_frames([dft]), ticks_per_day, dft.index.values)
+    return t[0], h[0]
 
 
 def r0(dft, tmax=25, tr=5, ticks_per_day=5):
-    T = dft.index.values
-    E = dft.NumberOfExposed.values
-    I = dft.NumberOfInfected.values
-    S = dft.NumberOfSusceptible.values
-    R = dft.NumberOfRecovered.values
-    N = S[0] + I[0]
-    r0 = np.array([(E[t] - E[t-1]) / (S[t-1]/N) / I[t-1] for t in T[1:tmax]])
-    return T[1:tmax], r0 * tr * ticks_per_day
+    T, r0 = r0_stack(stack_frames([dft]), tmax, tr, ticks_per_day)
+    return dft.index.values[T], r0[0]
 
 
 def r0_series(DFD, tmax=25, tr=5, ticks_per_day=5):
-    R0D = {}
-    AR0D = {}
-    TD  = {}
-
-    for key, value in DFD.items():
-        if key == 'STA':
-            continue
-        TD[key], R0D[key] = r0(value, tmax, tr, ticks_per_day)
-        AR0D[key] = R0D[key].mean()
+    keys = [key for key in DFD if key != 'STA']
+    T, R0 = r0_stack(stack_frames([DFD[key] for key in keys]), tmax, tr, ticks_per_day)
+    TD   = {key: DFD[key].index.values[T] for key in keys}
+    R0D  = dict(zip(keys, R0))
+    AR0D = {key: r0.mean() for key, r0 in R0D.items()}
     return TD, R0D, AR0D
 
 
+# Transmission tree analysis. infector and infection_tick are the arrays kept by
+# BarrioTortugaSEIR and ArraySEIR: infector[i] is the id of the turtle that
+# infected turtle i (-1 for the initial infected and for the never infected),
+# infection_tick[i] the tick at which it was infected (-1 if never).
+
+def offspring(infector, infection_tick, tmax=None):
+    """Number of secondary cases of every infected turtle.
+
+    If tmax is given only the turtles infected before tick tmax are kept, so
+    that cases still infectious at the end of the run do not bias the counts.
+    Returns the ids of the cases and their number of offspring.
+    """
+    infector = np.asarray(infector)
+    infection_tick = np.asarray(infection_tick)
+    counts = np.bincount(infector[infector >= 0], minlength=len(infector))
+    cases = infection_tick >= 0
+    if tmax is not None:
+        cases &= infection_tick < tmax
+    cases = np.flatnonzero(cases)
+    return cases, counts[cases]
+
+
+def offspring_distribution(infector, infection_tick, tmax=None):
+    """Fraction of cases with 0, 1, 2 ... secondary cases"""
+    _, z = offspring(infector, infection_tick, tmax)
+    return np.bincount(z) / max(len(z), 1)
+
+
+def generations(infector, infection_tick):
+    """Generation of every case: 0 for the initial infected, 1 for the turtles
+    they infected and so on; -1 for the never infected.
+    """
+    infector = np.asarray(infector)
+    infected = np.asarray(infection_tick) >= 0
+    gen = np.where(infected & (infector < 0), 0, -1)
+    todo = np.flatnonzero(infected & (infector >= 0))
+    g = 0
+    while len(todo):
+        now = gen[infector[todo]] == g
+        if not now.any():
+            break
+        gen[todo[now]] = g + 1
+        todo = todo[~now]
+        g += 1
+    return gen
+
+
+def r_by_generation(infector, infection_tick, tmax=None):
+    """Mean number of secondary cases per generation.
+
+    The last generations are still infecting when the run stops and come out
+    low; use tmax (see offspring) to cut them.
+    Returns the generations and R of each of them.
+    """
+    cases, z = offspring(infector, infection_tick, tmax)
+    gen = generations(infector, infection_tick)[cases]
+    n = np.bincount(gen)
+    keep = n > 0
+    return np.flatnonzero(keep), np.bincount(gen, weights=z)[keep] / n[keep]
+
+
+def r_by_time(infector, infection_tick, ticks_per_day=5, tmax=None):
+    """Case reproduction number: mean offspring of the turtles infected each day.
+
+    Returns the days and R(t) of the cases infected that day.
+    """
+    cases, z = offspring(infector, infection_tick, tmax)
+    day = np.asarray(infection_tick)[cases] // ticks_per_day
+    n = np.bincount(day)
+    keep = n > 0
+    return np.flatnonzero(keep), np.bincount(day, weights=z)[keep] / n[keep]
+
+
+def dispersion_k(z, mle=True):
+    """Fit of the offspring counts z to the negative binomial of c19 studies.
+
+    Returns (R, k): the mean number of secondary cases and the dispersion k
+    (small k, superspreading; k -> inf, Poisson). The moments estimate
+    k = R^2 / (var - R) is used as starting point of the maximum likelihood
+    fit, or returned if mle is False.
+    """
+    from scipy.optimize import minimize_scalar
+    from scipy.special import gammaln
+
+    z = np.asarray(z)
+    m, v = z.mean(), z.var(ddof=1)
+    k0 = m**2 / (v - m) if v > m else np.inf
+    if not mle or not np.isfinite(k0) or m == 0:
+        return m, k0
+
+    # log likelihood summed over the distinct values of z
+    values, counts = np.unique(z, return_counts=True)
+
+    def nll(logk):
+        k = np.exp(logk)
+        l = (gammaln(values + k) - gammaln(k) - gammaln(values + 1) +
+             k * np.log(k / (k + m)) + values * np.log(m / (k + m)))
+        return -np.dot(counts, l)
+
+    fit = minimize_scalar(nll, bracket=(np.log(k0) - 1, np.log(k0) + 1))
+    return m, np.exp(fit.x)
+
+
 def plot_average_I(DFD, F=True, S=True, P=True,
                    T=' Infected: R0 = 3.5, ti = 5.5, tr = 5', figsize=(8,8)):
     fig = plt.figure(figsize=figsize)
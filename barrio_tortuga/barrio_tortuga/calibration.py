@@ -0,0 +1,121 @@
+"""
+Calibration of the transmission probability against a target R0.
+
+The models set p = R0 / (nc x tr x ticks_per_day) with nc = 9 N / area, but
+moving turtles do not meet exactly nc others per tick, so the R0 realised by
+the simulation differs from the one asked. Rather than checking by hand with
+calib=True and analysis.r0, calibrate fits the nc_factor parameter of the models
+(nc -> nc_factor x nc, hence p -> p / nc_factor) so that the measured R0
+matches the target:
+
+    - R0 is measured directly from the transmission tree, as the mean number
+      of turtles infected by the index cases (the i0 initial infected) over
+      their whole infectious period.
+    - R0 is proportional to p as long as p << 1, so the fit is a stochastic
+      approximation on log(nc_factor): nc_factor *= R0 measured / R0 target.
+      The step is clipped to a factor MAX_STEP either way, so that an
+      iteration where no index case infects anyone (R0 = 0) does not drive
+      nc_factor, hence the contacts of the next model, to zero.
+    - Replicas run in batches in a process pool, and an iteration stops
+      adding batches once the standard error of its R0 is small compared to
+      its distance to the target: far from the target a few replicas are
+      enough to know where to go, close to it more are run, up to
+      max_replicas.
+
+The fitted p comes with a confidence interval from the standard error of the
+last R0 measurement.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import norm
+
+from . ArraySEIR import ArraySEIR
+from . ensemble import seeded_model
+from . analysis import generations, offspring
+
+MAX_STEP = 4     # largest change of nc_factor in one iteration
+
+
+def index_offspring(model, seed, steps, params):
+    """Run one replica and return the number of turtles infected by each index case"""
+    bt = seeded_model(model, seed, **params)
+    for _ in range(steps):
+        bt.step()
+    cases, z = offspring(bt.infector, bt.infection_tick)
+    return z[generations(bt.infector, bt.infection_tick)[cases] == 0]
+
+
+def default_steps(params):
+    """Ticks needed for the index cases to recover (a long tail for E and G delays)"""
+    tr  = params.get('tr', 3.5)
+    tpd = params.get('ticks_per_day', 5)
+    return int(np.ceil(tpd * tr * (1 if params.get('tr_dist', 'F') == 'F' else 4))) + 2
+
+
+def calibrate(r0            = 3.5,
+              model         = ArraySEIR,
+              rel_tol       = 0.02,     # target relative standard error of R0
+              batch         = 8,        # replicas run at a time
+              max_replicas  = 512,      # per iteration
+              max_iter      = 10,
+              processes     = None,     # worker processes, default number of cores
+              steps         = None,     # ticks per replica, default default_steps
+              seed          = None,
+              cl            = 0.95,     # confidence level of the interval
+              **params):
+    """Fit nc_factor (and so p) so that model(r0=r0, **params) realises R0 = r0.
+
+    Returns a dict with
+        nc_factor, p : the values of the last iteration (p read from the model).
+        p_ci         : confidence interval of p at level cl.
+        r0, r0_se    : R0 measured in the last iteration and its standard error.
+        converged    : whether r0 is within the interval of the measurement
+                       (False if max_iter was reached before).
+        replicas     : replicas run in total.
+        history      : (nc_factor, R0, R0 se, replicas) of every iteration.
+    """
+    params = dict(params, r0=r0)
+    factor = params.pop('nc_factor', 1.0)
+    steps  = default_steps(params) if steps is None else steps
+    zcl    = norm.ppf(0.5 + cl / 2)
+    seeds  = np.random.SeedSequence(seed)
+    pool   = ProcessPoolExecutor(processes) if processes != 1 else None
+
+    def run(n):
+        ss   = seeds.spawn(n)
+        args = [(model, int(s.generate_state(1)[0]), steps, dict(params, nc_factor=factor))
+                for s in ss]
+        if pool is None:
+            return [index_offspring(*a) for a in args]
+        return [f.result() for f in [pool.submit(index_offspring, *a) for a in args]]
+
+    history   = []
+    total     = 0
+    converged = False
+    try:
+        for i in range(max_iter):
+            z = np.concatenate(run(batch))
+            while True:
+                R, se = z.mean(), z.std(ddof=1) / np.sqrt(len(z))
+                enough = se <= max(rel_tol * r0, abs(R - r0) / (2 * zcl))
+                if enough or len(z) >= max_replicas * params.get('i0', 10):
+                    break
+                z = np.concatenate([z] + run(batch))
+            n = len(z) // params.get('i0', 10)
+            total += n
+            history.append((factor, R, se, n))
+
+            converged = abs(R - r0) <= zcl * se and se <= rel_tol * r0
+            if converged or i == max_iter - 1:
+                break    # the returned values are those of the factor run last
+            factor = factor * np.clip(R / r0, 1 / MAX_STEP, MAX_STEP)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    p  = model(**dict(params, nc_factor=factor)).p
+    dp = zcl * p * se / R if R > 0 else np.inf
+    return dict(nc_factor=factor, p=p, p_ci=(p - dp, p + dp), r0=R, r0_se=se,
+                converged=converged, replicas=total, history=history)
@@ -0,0 +1,166 @@
+"""
+Catalog of the experiments written by run_turtles.run_series.
+
+run_series writes each experiment in a directory named after its parameters,
+
+    Turtles_{turtles}_steps_{steps}_i0_{i0}_r0_{r0}_ti_{ti}_tr_{tr}_Tid_{ti_dist}_Tir_{tr_dist}_Pdist_{p_dist}
+
+holding DFT_run_{i}.csv, DFT_run_average.csv, STA.csv and (since the
+ensemble runner) runs.npy and stats.npy.
+
+A Catalog indexes the experiment directories under a data path once: one row
+per run with the parameters parsed from the directory name. The index is
+kept in catalog.csv at the top of the data path, so opening a catalog only
+reads that file; refresh() rescans the directories changed since. Queries
+select rows of the index and the series are only read for the selected
+runs, mapping runs.npy when available and reading the CSV otherwise.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from . columns import COLUMNS, STATS
+
+DATA  = os.environ.get('BARRIO_DATA',
+                       "/Users/jjgomezcadenas/Projects/Development/mesaTutorials/data")
+INDEX = 'catalog.csv'
+
+NAME = re.compile(r'Turtles_(?P<turtles>\d+)_steps_(?P<steps>\d+)_i0_(?P<i0>\d+)'
+                  r'_r0_(?P<r0>[-\d.e]+)_ti_(?P<ti>[-\d.e]+)_tr_(?P<tr>[-\d.e]+)'
+                  r'_Tid_(?P<ti_dist>\w)_Tir_(?P<tr_dist>\w)_Pdist_(?P<p_dist>\w)$')
+PARAMS = dict(turtles=int, steps=int, i0=int, r0=float, ti=float, tr=float,
+              ti_dist=str, tr_dist=str, p_dist=str)
+RUN = re.compile(r'DFT_run_(\d+)\.csv$')
+
+
+def parse_name(dirname):
+    """Parameters of a run_series directory name, None if it is not one"""
+    m = NAME.match(os.path.basename(os.path.normpath(dirname)))
+    if m is None:
+        return None
+    return {key: PARAMS[key](value) for key, value in m.groupdict().items()}
+
+
+def experiment_runs(mdir):
+    """Run numbers found in an experiment directory"""
+    npy = os.path.join(mdir, 'runs.npy')
+    if os.path.exists(npy):
+        return list(range(np.load(npy, mmap_mode='r').shape[0]))
+    runs = [RUN.match(f) for f in os.listdir(mdir)]
+    return sorted(int(m.group(1)) for m in runs if m is not None)
+
+
+class Catalog:
+    """Index of the experiments under path"""
+
+    def __init__(self, path=DATA, refresh=False):
+        self.path  = path
+        self.file  = os.path.join(path, INDEX)
+        self.index = None
+        if not refresh and os.path.exists(self.file):
+            self.index = pd.read_csv(self.file, sep=' ')
+        else:
+            self.refresh()
+        self._maps = {}
+
+
+    def refresh(self):
+        """Rescan the experiments that are new or changed since the last index"""
+        old = self.index
+        if old is None and os.path.exists(self.file):
+            old = pd.read_csv(self.file, sep=' ')
+        known = {} if old is None else dict(old.groupby('experiment').mtime.first())
+
+        frames = []
+        seen   = []
+        for entry in os.scandir(self.path):
+            params = parse_name(entry.name) if entry.is_dir() else None
+            if params is None:
+                continue
+            seen.append(entry.name)
+            mtime = entry.stat().st_mtime
+            if known.get(entry.name) == mtime:
+                continue
+            runs = experiment_runs(entry.path)
+            frames.append(pd.DataFrame(dict(experiment=entry.name, run=runs, mtime=mtime,
+                                            **params)))
+
+        if old is not None:
+            # keep the unchanged experiments, drop the changed and removed ones
+            fresh = {f.experiment.iloc[0] for f in frames if len(f)}
+            keep  = old.experiment.isin(seen) & ~old.experiment.isin(fresh)
+            frames.insert(0, old[keep])
+        columns = ['experiment', 'run', 'mtime'] + list(PARAMS)
+        frames  = [f for f in frames if len(f)]
+        self.index = (pd.concat(frames, ignore_index=True) if frames else
+                      pd.DataFrame(columns=columns))[columns]
+        self.index.to_csv(self.file, sep=' ', index=False)
+        self._maps = {}
+
+
+    def query(self, expr=None, **params):
+        """Rows of the index matching params (a value or a list of values each)
+        and, if given, the pandas query string expr.
+        """
+        sel = self.index
+        for key, value in params.items():
+            if isinstance(value, (list, tuple, set, np.ndarray)):
+                sel = sel[sel[key].isin(value)]
+            else:
+                sel = sel[sel[key] == value]
+        if expr is not None:
+            sel = sel.query(expr)
+        return sel
+
+
+    def experiments(self, expr=None, **params):
+        """One row per experiment (parameters and number of runs) matching the query"""
+        sel = self.query(expr, **params)
+        return (sel.groupby(['experiment'] + list(PARAMS), as_index=False)
+                   .run.count().rename(columns={'run': 'runs'}))
+
+
+    def _runs_map(self, experiment):
+        if experiment not in self._maps:
+            npy = os.path.join(self.path, experiment, 'runs.npy')
+            self._maps[experiment] = np.load(npy, mmap_mode='r') if os.path.exists(npy) else None
+        return self._maps[experiment]
+
+
+    def series(self, experiment, run):
+        """(steps x 4) counts of one run, columns in ensemble.COLUMNS order"""
+        runs = self._runs_map(experiment)
+        if runs is not None:
+            return runs[run]
+        f = os.path.join(self.path, experiment, f'DFT_run_{run}.csv')
+        return pd.read_csv(f, sep=' ', index_col=0)[list(COLUMNS)].values
+
+
+    def frame(self, experiment, run):
+        """One run as a datacollector DataFrame"""
+        return pd.DataFrame(self.series(experiment, run), columns=COLUMNS)
+
+
+    def frames(self, sel):
+        """DataFrames of the runs in sel (rows of the index), read one at a time"""
+        for row in sel.itertuples():
+            yield self.frame(row.experiment, row.run)
+
+
+    def stack(self, sel):
+        """Runs in sel as a (runs x steps x 4) array, for the analysis functions.
+        The runs must have the same number of steps.
+        """
+        return np.stack([self.series(row.experiment, row.run) for row in sel.itertuples()])
+
+
+    def stats(self, experiment, run=0):
+        """Ti, Tr and P of the turtles of one run"""
+        npy = os.path.join(self.path, experiment, 'stats.npy')
+        if os.path.exists(npy):
+            return pd.DataFrame(np.load(npy, mmap_mode='r')[run], columns=STATS)
+        return pd.read_csv(os.path.join(self.path, experiment, 'STA.csv'),
+                           sep=' ', index_col=0)
@@ -0,0 +1,10 @@
+"""
+Column names of the ensemble arrays (see ensemble.py).
+
+Kept apart from ensemble so that the analysis modules can use them without
+importing the models, mesa and multiprocessing.
+"""
+
+COLUMNS = ("NumberOfInfected", "NumberOfSusceptible",
+           "NumberOfRecovered", "NumberOfExposed")
+STATS   = ("Ti", "Tr", "P")
@@ -0,0 +1,83 @@
+"""
+Paired comparisons of parameter arms with common random numbers.
+
+To compare, say, p_dist 'F', 'S' and 'P', every replica runs all the arms
+with the same seed and ArraySEIR(crn=True): the arms start from the same
+turtles, walk the same walks and throw the same dice, so most of the
+replica to replica noise cancels in the difference between two arms. The
+error of a paired difference is the spread of the differences over the
+replicas, usually much smaller than that of two independent ensembles.
+
+compare_arms reports, for every arm and the metrics of analysis.summary,
+the mean difference to a reference arm, its paired standard error, the
+standard error the same replicas would give unpaired, and the variance
+reduction (unpaired / paired)^2, i.e. how many times fewer replicas the
+paired comparison needs.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . ArraySEIR import ArraySEIR
+from . columns import COLUMNS
+from . analysis import summary
+
+
+def run_arms(seed, steps, arms, params, crn=True):
+    """Run every arm ({name: params}) with the same seed.
+    Returns the (arms x steps+1 x 4) counts, in ensemble.COLUMNS order."""
+    runs = []
+    for arm in arms.values():
+        bt = ArraySEIR(seed=seed, crn=crn, **dict(params, **arm))
+        for _ in range(steps):
+            bt.step()
+        runs.append(bt.datacollector.get_model_vars_dataframe()[list(COLUMNS)].values)
+    return np.array(runs)
+
+
+def compare_arms(arms,                 # {name: parameters overriding params}
+                 ns        = 20,
+                 steps     = 500,
+                 seed      = None,
+                 processes = None,     # worker processes, default number of cores
+                 crn       = True,     # False pairs the replicas by seed only
+                 reference = None,     # arm the others are compared to, default the first
+                 tmax      = 25,       # ticks used by the R0 estimate
+                 **params):
+    """Run ns replicas of every arm and compare them to the reference arm.
+
+    Returns
+        runs      : (ns x arms x steps+1 x 4) counts.
+        summaries : {name: analysis.summary of the arm}.
+        diffs     : DataFrame indexed by (arm, metric) with the mean difference
+                    to the reference, its paired and unpaired standard errors
+                    and the variance reduction.
+    """
+    names = list(arms)
+    reference = names[0] if reference is None else reference
+    seeds = np.random.SeedSequence(seed).generate_state(ns)
+    args  = [(int(s), steps, arms, params, crn) for s in seeds]
+    if processes == 1:
+        runs = np.array([run_arms(*a) for a in args])
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            runs = np.array([f.result() for f in [pool.submit(run_arms, *a) for a in args]])
+
+    tr  = params.get('tr', 3.5)
+    tpd = params.get('ticks_per_day', 5)
+    summaries = {name: summary(runs[:, a], tmax, tr, tpd) for a, name in enumerate(names)}
+
+    ref  = summaries[reference]
+    rows = {}
+    for name in names:
+        if name == reference:
+            continue
+        d = summaries[name] - ref
+        paired   = d.std(ddof=1) / np.sqrt(ns)
+        unpaired = np.sqrt((summaries[name].var(ddof=1) + ref.var(ddof=1)) / ns)
+        rows[name] = pd.DataFrame({'mean': d.mean(), 'se': paired, 'unpaired_se': unpaired,
+                                   'reduction': (unpaired / paired)**2})
+    diffs = pd.concat(rows, names=['arm', 'metric']) if rows else pd.DataFrame()
+    return runs, summaries, diffs
@@ -0,0 +1,125 @@
+"""
+Ensembles of SEIR runs in worker processes, without pickling the results.
+
+The parent allocates two .npy files, mapped in memory:
+
+    runs  : (replicas x rows x 4) counts, columns in datacollector order, one
+            row every collect_every ticks (rows = steps // collect_every + 1)
+    stats : (replicas x turtles x 3) Ti, Tr and P of every turtle
+
+Each worker writes the series of its replica directly in its slice of both
+arrays, and the parent maps them read only. The per run DataFrames returned
+by run_frames are views of the mapped array: nothing is serialised or copied
+on the way back from the workers.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from abmkit.diagnostics import PrtLvl
+
+from . BarrioTortugaSEIR import BarrioTortugaSEIR
+from . ArraySEIR import ArraySEIR
+from . columns import COLUMNS, STATS
+from . tiles import run_tiled
+
+
+def seeded_model(model, seed, **params):
+    """model(**params) with all its random streams fixed by seed: the generators
+    of ArraySEIR, mesa's random and the global numpy stream of the agent model.
+    The agent model is muted unless prtl is given: the drivers build thousands."""
+    np.random.seed(seed)
+    if issubclass(model, BarrioTortugaSEIR):
+        params.setdefault('prtl', PrtLvl.Mute)
+    return model(seed=seed, **params)
+
+
+def run_replica(i, runs_file, stats_file, seed, model, steps, tiles, params):
+    """Run replica i and write its series and turtle stats in the shared files"""
+    bt = seeded_model(model, seed, **params)
+    if issubclass(model, ArraySEIR):
+        run_tiled(bt, steps, tiles)
+    else:
+        for _ in range(steps):
+            bt.step()
+
+    runs  = np.load(runs_file, mmap_mode='r+')
+    stats = np.load(stats_file, mmap_mode='r+')
+    runs[i]  = bt.datacollector.get_model_vars_dataframe()[list(COLUMNS)].values
+    stats[i] = np.column_stack([bt.Ti, bt.Tr, bt.P])
+    runs.flush()
+    stats.flush()
+
+
+def run_ensemble(ns        = 10,
+                 steps     = 500,
+                 processes = None,
+                 path      = None,
+                 seed      = None,
+                 model     = BarrioTortugaSEIR,
+                 tiles     = 1,
+                 **params):
+    """Run ns replicas of model(**params) for steps ticks in processes workers.
+
+    path: directory where runs.npy and stats.npy are kept. If None they go to
+    a temporary file that is removed once mapped.
+    processes: number of workers (default number of cores); 1 runs in process.
+    tiles: for ArraySEIR models, each replica is split in tiles (see tiles.py).
+
+    Returns the runs and stats arrays (read only maps, see module docstring).
+    Raises ValueError for calib runs, whose datacollector does not report COLUMNS.
+    """
+    if params.get('calib', False):
+        raise ValueError('calib runs report NumberOfneighbors, not the ensemble COLUMNS: '
+                         'run the model directly')
+    turtles = params.get('turtles', 1000)
+    rows    = steps // params.get('collect_every', 1) + 1
+    tmp     = None
+    if path is None:
+        tmp  = tempfile.mkdtemp()
+        path = tmp
+    runs_file  = os.path.join(path, 'runs.npy')
+    stats_file = os.path.join(path, 'stats.npy')
+    np.lib.format.open_memmap(runs_file, mode='w+', dtype=np.int64,
+                              shape=(ns, rows, len(COLUMNS)))
+    np.lib.format.open_memmap(stats_file, mode='w+', dtype=np.float64,
+                              shape=(ns, turtles, len(STATS)))
+
+    seeds = np.random.SeedSequence(seed).generate_state(ns)
+    args  = [(i, runs_file, stats_file, int(seeds[i]), model, steps, tiles,
+              params)
+             for i in range(ns)]
+    if processes == 1:
+        for a in args:
+            run_replica(*a)
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            for f in [pool.submit(run_replica, *a) for a in args]:
+                f.result()
+
+    runs  = np.load(runs_file, mmap_mode='r')
+    stats = np.load(stats_file, mmap_mode='r')
+    if tmp is not None:   # the maps stay valid once the files are gone
+        os.remove(runs_file)
+        os.remove(stats_file)
+        os.rmdir(tmp)
+    return runs, stats
+
+
+def run_frames(runs):
+    """One DataFrame per replica, each a view of runs"""
+    return [pd.DataFrame(r, columns=COLUMNS, copy=False) for r in runs]
+
+
+def stats_frames(stats):
+    """One DataFrame of turtle stats per replica, each a view of stats"""
+    return [pd.DataFrame(s, columns=STATS, copy=False) for s in stats]
+
+
+def average_frame(runs):
+    """Average over the replicas, as run_series writes in DFT_run_average"""
+    return pd.DataFrame(runs.mean(axis=0), columns=COLUMNS)
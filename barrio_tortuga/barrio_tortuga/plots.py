@@ -0,0 +1,129 @@
+"""
+Batch rendering of SEIR ensembles to image files.
+
+The plot_* functions of analysis draw every replica at full resolution and
+call plt.show(). Here figures are built on the Agg canvas without pyplot, so
+they can be rendered unattended and in worker processes:
+
+    - the ensemble is drawn as quantile bands plus a small random sample of
+      trajectories, whatever the number of replicas.
+    - series longer than the figure is wide (in pixels) are decimated to one
+      min/max pair per pixel column, so peaks are kept.
+    - render_sweep renders one figure per experiment of a catalog.Catalog in
+      a pool of processes; the workers read the runs themselves, so no array
+      is sent through the pool.
+
+All functions take runs as the (replicas x steps x 4) stacked array of
+ensemble.run_ensemble or catalog.Catalog.stack.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from . columns import COLUMNS
+from . analysis import bands, population
+from . catalog import Catalog
+
+LABELS = dict(zip(COLUMNS, 'ISRE'))
+COLORS = dict(zip(COLUMNS, ('r', 'g', 'b', 'y')))
+
+
+def buckets(n, width):
+    """Start of each of (at most) width buckets splitting n points"""
+    return np.unique(np.linspace(0, n, min(n, width) + 1).astype(int)[:-1])
+
+
+def decimate(t, y, width, how='minmax'):
+    """Reduce the series y (..., n) sampled at t to about width points.
+
+    how = 'minmax' keeps the minimum and maximum of each bucket (2 points per
+    bucket), 'min', 'max' and 'mean' one point per bucket.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = y.shape[-1]
+    if n <= width:
+        return t, y
+    b = buckets(n, width)
+    if how == 'minmax':
+        lo = np.minimum.reduceat(y, b, axis=-1)
+        hi = np.maximum.reduceat(y, b, axis=-1)
+        return np.repeat(t[b], 2), np.stack([lo, hi], axis=-1).reshape(y.shape[:-1] + (-1,))
+    if how == 'mean':
+        return t[b], np.add.reduceat(y, b, axis=-1) / np.diff(np.append(b, n))
+    reduce = np.minimum if how == 'min' else np.maximum
+    return t[b], reduce.reduceat(y, b, axis=-1)
+
+
+def plot_ensemble(ax, runs, columns=("NumberOfInfected",), q=(0.05, 0.5, 0.95),
+                  sample=10, ticks_per_day=5, width=800, seed=None):
+    """Quantile bands (outer q), median and sample random trajectories of the
+    fraction of turtles in each of columns, decimated to width points
+    """
+    runs = np.asarray(runs)
+    N = population(runs)[:, None]
+    t = np.arange(runs.shape[1]) / ticks_per_day
+    rng = np.random.default_rng(seed)
+    pick = rng.choice(len(runs), size=min(sample, len(runs)), replace=False)
+
+    for name in columns:
+        c = COLUMNS.index(name)
+        frac = runs[:, :, c] / N
+        lo, med, hi = bands(frac[:, :, None], 0, (q[0], 0.5, q[-1]))
+        tb, lo = decimate(t, lo, width, 'min')
+        _,  hi = decimate(t, hi, width, 'max')
+        tm, med = decimate(t, med, width, 'mean')
+        ax.fill_between(tb, lo, hi, color=COLORS[name], alpha=0.25, lw=0)
+        ax.plot(tm, med, color=COLORS[name], lw=2,
+                label=f'{LABELS[name]} median ({len(runs)} runs)')
+        ts, ys = decimate(t, frac[pick], width)
+        ax.plot(ts, ys.T, color=COLORS[name], lw=0.5, alpha=0.5)
+
+    ax.set_xlabel('time (days)')
+    ax.set_ylabel('Fraction of turtles')
+    ax.legend()
+
+
+def render(runs, filename, title='', columns=("NumberOfInfected",), figsize=(8, 6),
+           dpi=100, **kwargs):
+    """Write the plot_ensemble figure of runs to filename"""
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    plot_ensemble(ax, runs, columns, width=int(figsize[0] * dpi), **kwargs)
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(filename)
+    return filename
+
+
+def title_of(row):
+    return (f'R0 = {row.r0}, ti = {row.ti}, tr = {row.tr}, '
+            f'Tid = {row.ti_dist}, Tir = {row.tr_dist}, Pdist = {row.p_dist}')
+
+
+def render_experiment(path, experiment, filename, kwargs):
+    """Worker: read the runs of experiment from the catalog at path and render them"""
+    catalog = Catalog(path)
+    sel = catalog.query(experiment=experiment)
+    return render(catalog.stack(sel), filename, title_of(sel.iloc[0]), **kwargs)
+
+
+def render_sweep(catalog, outdir, expr=None, processes=None, fmt='png', **params):
+    """One figure per experiment of catalog matching the query (expr, params),
+    rendered in processes workers (1 renders in process) to outdir/<experiment>.fmt.
+
+    Other keyword arguments of render (columns, figsize, q, sample ...) go in
+    params['render'] as a dict. Returns the files written.
+    """
+    kwargs = params.pop('render', {})
+    os.makedirs(outdir, exist_ok=True)
+    jobs = [(catalog.path, e, os.path.join(outdir, f'{e}.{fmt}'), kwargs)
+            for e in catalog.experiments(expr, **params).experiment]
+    if processes == 1:
+        return [render_experiment(*job) for job in jobs]
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(render_experiment, *zip(*jobs))) if jobs else []
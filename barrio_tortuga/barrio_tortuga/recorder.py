@@ -0,0 +1,145 @@
+"""
+Per turtle trajectory recording in a compact columnar format.
+
+Rather than the state of every turtle at every tick, a recording keeps:
+
+    events    : one row per change of kind (turtle id, tick, old kind, new kind
+                and the id of the infector for S -> E, -1 otherwise).
+    positions : x and y of all the turtles, every `stride` ticks.
+
+A recording is a directory with one raw binary file per column plus a
+meta.json describing their dtypes. Columns are buffered in fixed size chunks
+and appended to the files when a chunk is full, so memory stays flat however
+long the run. Kinds are stored as small integers (S, E, I, R = 0, 1, 2, 3).
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+KINDS = 'SEIR'
+
+EVENTS = (('turtle', 'i4'), ('tick', 'i4'), ('old', 'i1'), ('new', 'i1'),
+          ('infector', 'i4'))
+
+
+class TrajectoryRecorder:
+    """Streams the events and positions of a SEIR run to the directory path"""
+
+    def __init__(self, path, turtles, width, height, stride=5, chunk=1 << 16):
+        """
+        turtles, width, height: size of the model to record.
+        stride: ticks between two snapshots of the positions.
+        chunk : number of events buffered before writing to disk.
+        """
+        self.path    = path
+        self.turtles = turtles
+        self.stride  = stride
+        self.chunk   = chunk
+        self.pos_dtype = 'i2' if max(width, height) <= np.iinfo(np.int16).max else 'i4'
+        os.makedirs(path, exist_ok=True)
+
+        meta = dict(turtles=turtles, width=width, height=height, stride=stride,
+                    events=dict(EVENTS), positions=self.pos_dtype)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        self.files  = {name: open(os.path.join(path, f'event_{name}.bin'), 'wb')
+                       for name, _ in EVENTS}
+        self.buffer = {name: np.zeros(chunk, dtype=dtype) for name, dtype in EVENTS}
+        self.n      = 0
+
+        # positions are buffered a few snapshots at a time
+        self.pos_files  = {c: open(os.path.join(path, f'pos_{c}.bin'), 'wb') for c in 'xy'}
+        self.pos_rows   = max(1, chunk // turtles)
+        self.pos_buffer = {c: np.zeros((self.pos_rows, turtles), dtype=self.pos_dtype)
+                           for c in 'xy'}
+        self.npos       = 0
+
+    def initial(self, kinds):
+        """Kinds (letters or codes) of all the turtles at tick 0"""
+        kinds = [KINDS.index(k) if isinstance(k, str) else k for k in kinds]
+        np.asarray(kinds, dtype='i1').tofile(os.path.join(self.path, 'initial_kind.bin'))
+
+    def event(self, turtle, tick, old, new, infector=-1):
+        """One change of kind; old and new are kind letters or codes"""
+        if self.n == self.chunk:
+            self.flush_events()
+        b, i = self.buffer, self.n
+        b['turtle'][i]   = turtle
+        b['tick'][i]     = tick
+        b['old'][i]      = KINDS.index(old) if isinstance(old, str) else old
+        b['new'][i]      = KINDS.index(new) if isinstance(new, str) else new
+        b['infector'][i] = infector
+        self.n += 1
+
+    def events(self, turtles, tick, old, new, infectors=-1):
+        """Vector version of event, for the turtles (ids) changing together"""
+        k = len(turtles)
+        columns = dict(turtle=turtles, tick=np.full(k, tick), old=np.broadcast_to(old, k),
+                       new=np.broadcast_to(new, k), infector=np.broadcast_to(infectors, k))
+        s = 0
+        while s < k:
+            if self.n == self.chunk:
+                self.flush_events()
+            m = min(k - s, self.chunk - self.n)
+            for name, col in columns.items():
+                self.buffer[name][self.n:self.n + m] = col[s:s + m]
+            self.n += m
+            s += m
+
+    def positions(self, tick, x, y):
+        """Snapshot of the positions of all turtles (by id), if tick is on the stride"""
+        if tick % self.stride:
+            return
+        if self.npos == self.pos_rows:
+            self.flush_positions()
+        self.pos_buffer['x'][self.npos] = x
+        self.pos_buffer['y'][self.npos] = y
+        self.npos += 1
+
+    def flush_events(self):
+        for name, f in self.files.items():
+            self.buffer[name][:self.n].tofile(f)
+        self.n = 0
+
+    def flush_positions(self):
+        for c, f in self.pos_files.items():
+            self.pos_buffer[c][:self.npos].tofile(f)
+        self.npos = 0
+
+    def close(self):
+        self.flush_events()
+        self.flush_positions()
+        for f in list(self.files.values()) + list(self.pos_files.values()):
+            f.close()
+
+
+def load_trajectories(path):
+    """Read a recording.
+
+    Returns a dict with
+        meta      : the content of meta.json
+        initial   : kind codes of the turtles at tick 0
+        events    : DataFrame with columns turtle, tick, old, new, infector
+        x, y      : (snapshots x turtles) position arrays, mapped from disk
+        ticks     : tick of each snapshot
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    events = pd.DataFrame({name: np.fromfile(os.path.join(path, f'event_{name}.bin'),
+                                             dtype=dtype)
+                           for name, dtype in meta['events'].items()})
+    initial = np.fromfile(os.path.join(path, 'initial_kind.bin'), dtype='i1')
+
+    rec = dict(meta=meta, initial=initial, events=events)
+    for c in 'xy':
+        fname = os.path.join(path, f'pos_{c}.bin')
+        if os.path.getsize(fname):
+            rec[c] = np.memmap(fname, dtype=meta['positions'], mode='r').reshape(-1, meta['turtles'])
+        else:
+            rec[c] = np.zeros((0, meta['turtles']), dtype=meta['positions'])
+    rec['ticks'] = np.arange(len(rec['x'])) * meta['stride']
+    return rec
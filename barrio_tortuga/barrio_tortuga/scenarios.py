@@ -0,0 +1,170 @@
+"""
+Scenario branching from snapshots of a running model.
+
+To compare interventions starting at day 20, rather than re-running the
+first 20 days for every scenario, the model is run once up to day 20, a
+snapshot is taken, and every scenario is a fork of the snapshot with some
+parameters changed:
+
+    snapshot(model)         : in memory copy of a BarrioTortugaSEIR or
+                              ArraySEIR (state, grid, schedule, datacollector
+                              and random streams, the global NumPy one
+                              included since the agent model draws from it).
+    fork(snap, **changes)   : an independent model continuing from the
+                              snapshot, with changes applied (see apply). With
+                              seed the branch draws new random numbers,
+                              otherwise it continues the snapshot's streams,
+                              and branches differ only by their changes.
+    run_branches(...)       : run every scenario (repeats times) from the
+                              snapshot, in worker processes.
+
+With the fork start method (Linux, macOS) the workers inherit the snapshot
+from the parent, copy on write: one worker process is started per branch
+and advances the inherited model in place, so the snapshot is neither
+pickled nor copied by Python. Elsewhere (or with processes=1) each branch
+works on a deep copy.
+
+A model recording trajectories (record) is forked without recorder: the
+branches do not write in the files of the prefix.
+
+An ArraySEIR fork without changes nor seed reproduces the uninterrupted run
+exactly. A seeded agent model (ensemble.seeded_model) is reproducible run to
+run, but its forks continue the snapshot only statistically: deepcopy
+reallocates the turtles, and mesa's MultiGrid iterates the set of turtles of
+a cell by address, so the copy visits them in another order.
+"""
+
+import copy
+import multiprocessing as mp
+
+import numpy as np
+
+from . ArraySEIR import ArraySEIR
+from . columns import COLUMNS
+
+
+class Snapshot:
+    """A model and the global NumPy random state at the time of the snapshot"""
+
+    def __init__(self, model):
+        recorder, model.recorder = model.recorder, None
+        try:
+            self.model = copy.deepcopy(model)
+        finally:
+            model.recorder = recorder
+        self.np_state = np.random.get_state()
+        self.tick     = steps_of(self.model)
+
+
+def steps_of(model):
+    if isinstance(model, ArraySEIR):
+        return model.steps
+    return model.schedule.steps
+
+
+def snapshot(model):
+    return Snapshot(model)
+
+
+def apply(model, p_scale=None, mobility=None, **attrs):
+    """Change a running model.
+
+    p_scale  : multiplies the infection probability of every turtle (and p).
+    mobility : probability that a turtle moves in a tick.
+    attrs    : other model attributes set as they are (e.g. p_home).
+    """
+    if p_scale is not None:
+        model.p *= p_scale
+        if isinstance(model, ArraySEIR):
+            model.P = model.P * p_scale
+        else:
+            for a in model.schedule.agents:
+                a.p *= p_scale
+            model.P = [p * p_scale for p in model.P]
+    if mobility is not None:
+        model.mobility = mobility
+    for name, value in attrs.items():
+        if not hasattr(model, name):
+            raise AttributeError(f'{type(model).__name__} has no attribute {name}')
+        setattr(model, name, value)
+    return model
+
+
+def reseed(model, seed):
+    """Replace every random stream of model (and the global one) by streams seeded with seed"""
+    ss = np.random.SeedSequence(seed)
+    np.random.seed(int(ss.generate_state(1)[0]))
+    model.random.seed(int(ss.generate_state(2)[1]))
+    # Generators are reseeded in place: samplers hold references to them
+    gens = [model.rng] + [g for g in getattr(model, 'streams', {}).values() if g is not model.rng]
+    for g, s in zip(gens, ss.spawn(len(gens))):
+        g.bit_generator.state = np.random.default_rng(s).bit_generator.state
+
+
+def fork(snap, seed=None, copy_model=True, **changes):
+    """A model continuing from snap with changes (see apply).
+    copy_model=False advances the snapshot's own model (forked workers)."""
+    model = copy.deepcopy(snap.model) if copy_model else snap.model
+    np.random.set_state(snap.np_state)
+    if seed is not None:
+        reseed(model, seed)
+    return apply(model, **changes)
+
+
+def counts(model):
+    """The datacollector series in ensemble.COLUMNS order"""
+    return model.datacollector.get_model_vars_dataframe()[list(COLUMNS)].values
+
+
+def run_branch(snap, changes, seed, steps, copy_model=True):
+    model = fork(snap, seed, copy_model, **changes)
+    for _ in range(steps):
+        model.step()
+    return counts(model)
+
+
+_SNAPSHOT = None   # the snapshot inherited by forked workers
+
+
+def _run_inherited(changes, seed, steps):
+    return run_branch(_SNAPSHOT, changes, seed, steps, copy_model=False)
+
+
+def run_branches(snap,
+                 scenarios,              # {name: changes}, see apply
+                 steps     = 250,        # ticks run after the snapshot
+                 repeats   = 1,          # branches per scenario
+                 seed      = None,       # None continues the snapshot streams (repeats must be 1)
+                 processes = None):      # worker processes, default number of cores
+    """Run every scenario from the snapshot.
+
+    Returns {name: (repeats x tick+steps+1 x 4) counts}, prefix included,
+    columns in ensemble.COLUMNS order.
+    """
+    global _SNAPSHOT
+    if seed is None and repeats > 1:
+        raise ValueError('repeats > 1 needs a seed, the branches would be identical')
+    seeds = [None] * repeats
+    if seed is not None:
+        seeds = [int(s) for s in np.random.SeedSequence(seed).generate_state(repeats)]
+    tasks = [(name, changes, s) for name, changes in scenarios.items() for s in seeds]
+
+    if processes == 1:
+        results = [run_branch(snap, changes, s, steps) for _, changes, s in tasks]
+    elif 'fork' in mp.get_all_start_methods():
+        _SNAPSHOT = snap
+        try:
+            # a fresh fork per branch, each advancing its inherited copy of the model
+            with mp.get_context('fork').Pool(processes, maxtasksperchild=1) as pool:
+                results = pool.starmap(_run_inherited, [(c, s, steps) for _, c, s in tasks],
+                                       chunksize=1)
+        finally:
+            _SNAPSHOT = None
+    else:
+        with mp.get_context().Pool(processes) as pool:
+            results = pool.starmap(run_branch, [(snap, c, s, steps) for _, c, s in tasks])
+
+    out = {}
+    for (name, _, _), r in zip(tasks, results):
+        out.setdefault(name, []).append(r)
+    return {name: np.array(r) for name, r in out.items()}
@@ -4,29 +4,31 @@ from mesa.visualization.UserParam import UserSettableParameter
 
 from barrio_tortuga.BarrioTortugaSEIR import BarrioTortugaSEIR
 from barrio_tortuga.BarrioTortugaSEIR import SeirTurtle
-from barrio_tortuga.BarrioTortugaSEIR import CALIB
+from barrio_tortuga.ArraySEIR import Kind
 
 def agent_portrayal(agent):
     portrayal = {"Shape": "circle",
                  "Filled": "true",
                  "r": 0.2}
 
-    if agent.kind == "S":
+    if agent.kind == Kind.S:
         portrayal["Color"] = "grey"
         portrayal["Layer"] = 0
-    elif agent.kind == "E":
+    elif agent.kind == Kind.E:
         portrayal["Color"] = "blue"
         portrayal["Layer"] = 0
-    elif agent.kind == "I":
+    elif agent.kind == Kind.I:
         portrayal["Color"] = "red"
         portrayal["Layer"] = 0
-    elif agent.kind == "R":
+    elif agent.kind == Kind.R:
         portrayal["Color"] = "green"
         portrayal["Layer"] = 0
 
     return portrayal
 
 
+CALIB = False   # show the number of neighbours of a calib model instead of the epidemic
+
 canvas_element = CanvasGrid(agent_portrayal, 40, 40, 800, 800)
 if CALIB:
     chart          = ChartModule([{"Label" : "NumberOfneighbors", "Color": "#666666"}]
@@ -42,7 +44,8 @@ model_params = {"turtles": UserSettableParameter('slider', 'turtles', 1000, 100,
                 "i0" : UserSettableParameter('slider', 'i0', 10, 1, 100, 5),
                 "r0" : UserSettableParameter('slider', 'r0', 3.5, 0.5, 10.5, 0.5),
                 "ti_shape" : UserSettableParameter('slider', 'ti', 5.8, 1, 20, 1),
-                "tr" : UserSettableParameter('slider', 'tr', 5, 1, 20, 1)}
+                "tr" : UserSettableParameter('slider', 'tr', 5, 1, 20, 1),
+                "calib" : CALIB}
 
 
 server = ModularServer(BarrioTortugaSEIR, [canvas_element, chart], "Barrio Tortuga SEIR",
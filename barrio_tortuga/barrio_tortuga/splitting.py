@@ -0,0 +1,106 @@
+"""
+Probability of a major outbreak by multilevel splitting.
+
+With few initial infected most runs die out early, and the probability that
+one grows into a major outbreak (that the cumulative number of infections,
+turtles - S, reaches some size) needs thousands of full runs to estimate.
+Splitting follows the runs that do grow and drops those that die out:
+
+    levels L_1 < L_2 < ... < L_K of cumulative infections.
+    stage 1 : n runs start from the initial state. Each runs until it reaches
+              L_1 (a hit) or the epidemic is extinct (no E nor I turtles) or
+              tmax ticks have passed. p_1 = hits / n.
+    stage k : n runs start from clones of the states that hit L_(k-1), the
+              clones spread evenly over them (fixed effort), each going on
+              with its own random numbers (scenarios.fork with a new seed).
+              p_k = hits / n.
+
+P(outbreak of size L_K) = p_1 x ... x p_K, an unbiased estimate; its relative
+error is about sqrt(sum_k (1 - p_k) / (n p_k)). The runs that die out do so
+early, and no run goes on past the next level, so the cost is a fraction of
+that of brute force (direct_probability) for the same error. Extinction is
+the complementary event 1 - P.
+"""
+
+import numpy as np
+
+from . ArraySEIR import ArraySEIR
+from . ensemble import seeded_model
+from . scenarios import snapshot, fork, steps_of
+
+
+def cumulative_infections(model):
+    return model.turtles - model.number_of_agents('S')
+
+
+def extinct(model):
+    return model.number_of_agents('E') + model.number_of_agents('I') == 0
+
+
+def advance(model, level, tmax):
+    """Step model until level cumulative infections (True), extinction or tick tmax (False).
+    Returns the outcome and the ticks stepped."""
+    t0 = steps_of(model)
+    while cumulative_infections(model) < level:
+        if extinct(model) or steps_of(model) >= tmax:
+            return False, steps_of(model) - t0
+        model.step()
+    return True, steps_of(model) - t0
+
+
+def splitting(levels,                  # increasing cumulative infections
+              n      = 100,            # runs per stage
+              model  = ArraySEIR,
+              tmax   = 1000,           # ticks after which a run counts as failed
+              seed   = None,
+              **params):
+    """Splitting estimate of the probability that model(**params) reaches
+    levels[-1] cumulative infections before extinction (and tick tmax).
+
+    Returns a dict with probability, rel_error, the conditional probabilities
+    p of every level, and the ticks simulated.
+    """
+    seeds = np.random.SeedSequence(seed)
+    p     = []
+    ticks = 0
+    start = None   # snapshots of the hits of the previous stage
+    for level in levels:
+        s = [int(x) for x in seeds.spawn(1)[0].generate_state(n)]
+        if start is None:
+            runs = [seeded_model(model, s[i], **params) for i in range(n)]
+        else:
+            # fixed effort: n clones spread evenly over the hits, the remainder at random
+            owner = np.arange(n) % len(start)
+            owner[n - n % len(start):] = np.random.default_rng(s[0]).permutation(
+                len(start))[:n % len(start)]
+            runs = [fork(start[o], seed=s[i]) for i, o in enumerate(owner)]
+
+        hits = []
+        for run in runs:
+            hit, dt = advance(run, level, tmax)
+            ticks += dt
+            if hit:
+                hits.append(snapshot(run))
+        p.append(len(hits) / n)
+        if not hits:
+            break
+        start = hits
+
+    p = np.array(p + [0.0] * (len(levels) - len(p)))
+    prob = float(np.prod(p))
+    with np.errstate(divide='ignore'):
+        rel = float(np.sqrt(np.sum((1 - p) / (n * p)))) if prob > 0 else np.inf
+    return dict(probability=prob, rel_error=rel, p=p, levels=np.array(levels), ticks=ticks)
+
+
+def direct_probability(level, runs=1000, model=ArraySEIR, tmax=1000, seed=None, **params):
+    """Brute force estimate: fraction of runs reaching level cumulative infections.
+    Returns the probability, its standard error and the ticks simulated."""
+    seeds = np.random.SeedSequence(seed).generate_state(runs)
+    hits = ticks = 0
+    for s in seeds:
+        hit, dt = advance(seeded_model(model, int(s), **params), level, tmax)
+        hits  += hit
+        ticks += dt
+    prob = hits / runs
+    return prob, np.sqrt(prob * (1 - prob) / runs), ticks
@@ -74,3 +74,95 @@ def sknormal_rvs(mu, sigma, a, size=0):
 def lognorm_pdf(x, mu, sigma):
     """lognorm distribution"""
     return lognorm.pdf(x, sigma, scale=np.exp(mu))
+
+
+class Sampler:
+    """Random variates of a frozen distribution, drawn in blocks.
+
+    draw(rng, size) draws size variates from the numpy Generator rng. Values
+    are handed out from a buffer of block variates, refilled when empty, so a
+    call costs an array index rather than the argument checks of scipy .rvs.
+    rng may be a Generator, a seed or None.
+    """
+
+    def __init__(self, draw, rng=None, block=4096):
+        self.draw   = draw
+        self.rng    = np.random.default_rng(rng)
+        self.block  = block
+        self.buffer = np.empty(0)
+        self.i      = 0
+
+    def refill(self):
+        self.buffer = self.draw(self.rng, self.block)
+        self.i      = 0
+
+    def __call__(self, size=None):
+        """One variate if size is None, else an array of size variates"""
+        if size is None:
+            if self.i == len(self.buffer):
+                self.refill()
+            self.i += 1
+            return self.buffer[self.i - 1]
+        if size > self.block:
+            return self.draw(self.rng, size)
+        if self.i == len(self.buffer):
+            self.refill()
+        out = np.empty(size, dtype=self.buffer.dtype)
+        n = 0
+        while n < size:
+            if self.i == len(self.buffer):
+                self.refill()
+            m = min(size - n, len(self.buffer) - self.i)
+            out[n:n + m] = self.buffer[self.i:self.i + m]
+            self.i += m
+            n += m
+        return out
+
+    rvs = __call__
+
+
+def nbinom_sampler(n, p, rng=None, block=4096):
+    """scipy nbinom(n, p)"""
+    return Sampler(lambda g, size: g.negative_binomial(n, p, size), rng, block)
+
+
+def c19_nbinom_sampler(r0, k, rng=None, block=4096):
+    """Negative binomial of mean r0 and dispersion k (see c19_nbinom_transform)"""
+    return nbinom_sampler(*c19_nbinom_transform(r0, k), rng=rng, block=block)
+
+
+def weibull_sampler(shape, scale=1.0, rng=None, block=4096):
+    """scipy weibull_min(shape, scale=scale), as c19_weib_rvs(scale, shape)"""
+    return Sampler(lambda g, size: scale * g.weibull(shape, size), rng, block)
+
+
+def skewnorm_sampler(a, loc=0.0, scale=1.0, rng=None, block=4096):
+    """scipy skewnorm(a, loc, scale), from two normals:
+    loc + scale (delta |u0| + sqrt(1 - delta^2) u1), delta = a / sqrt(1 + a^2)
+    """
+    delta = a / np.sqrt(1 + a**2)
+
+    def draw(g, size):
+        u0, u1 = g.standard_normal((2, size))
+        return loc + scale * (delta * np.abs(u0) + np.sqrt(1 - delta**2) * u1)
+    return Sampler(draw, rng, block)
+
+
+def lognorm_sampler(mu, sigma, rng=None, block=4096):
+    """lognormal of log mean mu and log sigma, as lognorm_pdf"""
+    return Sampler(lambda g, size: g.lognormal(mu, sigma, size), rng, block)
+
+
+def gamma_sampler(a, scale=1.0, rng=None, block=4096):
+    """scipy gamma(a, scale=scale)"""
+    return Sampler(lambda g, size: g.gamma(a, scale, size), rng, block)
+
+
+def expon_sampler(scale=1.0, rng=None, block=4096):
+    """scipy expon(scale=scale)"""
+    return Sampler(lambda g, size: g.exponential(scale, size), rng, block)
+
+
+def fixed_sampler(value, rng=None, block=4096):
+    """Always value, for the F choices of the models"""
+    return Sampler(lambda g, size: np.full(size, value), rng, block)
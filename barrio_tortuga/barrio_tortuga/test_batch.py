@@ -0,0 +1,34 @@
+'''
+Testing the replica batched BatchSEIR.
+'''
+
+import numpy as np
+
+from barrio_tortuga.BatchSEIR import BatchSEIR, run_batched
+
+
+def runs(replicas, **params):
+    bt = BatchSEIR(replicas=replicas, turtles=400, i0=5, seed=11, **params)
+    bt.run(40)
+    return bt.runs(), bt.stats()
+
+
+def test_replicas_independent_of_batch_size():
+    few, few_stats = runs(2)
+    many, many_stats = runs(5)
+    assert (few == many[:2]).all()
+    assert (few_stats == many_stats[:2]).all()
+
+
+def test_reorder_keeps_stats_by_turtle_id():
+    plain, plain_stats = runs(3)
+    _, sorted_stats = runs(3, reorder=10)
+    assert (plain_stats == sorted_stats).all()
+    assert (plain.sum(axis=2) == 400).all()
+
+
+def test_run_batched_writes_the_ensemble_files(tmp_path):
+    r, s = run_batched(2, 10, seed=1, path=str(tmp_path), turtles=100)
+    assert (np.load(tmp_path / 'runs.npy') == r).all()
+    assert (np.load(tmp_path / 'stats.npy') == s).all()
+    assert r.shape == (2, 11, 4) and s.shape == (2, 100, 3)
@@ -0,0 +1,33 @@
+'''
+Testing the shared memory ensembles of ensemble.run_ensemble.
+'''
+
+import numpy as np
+import pytest
+
+from barrio_tortuga.ensemble import run_ensemble, seeded_model
+from barrio_tortuga.BarrioTortugaSEIR import BarrioTortugaSEIR
+from barrio_tortuga.columns import COLUMNS
+
+
+def test_replicas_match_direct_runs():
+    steps = 20
+    runs, stats = run_ensemble(2, steps, processes=1, seed=1, turtles=200)
+    seed = int(np.random.SeedSequence(1).generate_state(2)[1])
+    bt = seeded_model(BarrioTortugaSEIR, seed, turtles=200)
+    for _ in range(steps):
+        bt.step()
+    df = bt.datacollector.get_model_vars_dataframe()
+    assert (runs[1] == df[list(COLUMNS)].values).all()
+    assert (stats[1][:, 2] == bt.P).all()
+
+
+def test_collect_every_sizes_the_runs():
+    runs, _ = run_ensemble(2, 20, processes=1, seed=1, turtles=200, collect_every=5)
+    assert runs.shape == (2, 5, len(COLUMNS))
+    assert (runs.sum(axis=2) == 200).all()
+
+
+def test_calib_is_rejected():
+    with pytest.raises(ValueError):
+        run_ensemble(2, 20, processes=1, turtles=200, calib=True)
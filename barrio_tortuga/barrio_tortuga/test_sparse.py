@@ -0,0 +1,30 @@
+'''
+Testing that the sparse grid backend gives the same runs as the dense one.
+'''
+
+from barrio_tortuga.ensemble import seeded_model
+from barrio_tortuga.BarrioTortugaSEIR import BarrioTortugaSEIR
+from barrio_tortuga.ArraySEIR import ArraySEIR
+
+
+def run(model, steps, **params):
+    bt = seeded_model(model, 3, **params)
+    for _ in range(steps):
+        bt.step()
+    return bt
+
+
+def test_agent_model_sparse_equals_dense():
+    dense = run(BarrioTortugaSEIR, 30, turtles=300, sparse=False)
+    sparse = run(BarrioTortugaSEIR, 30, turtles=300, sparse=True)
+    assert dense.datacollector.get_model_vars_dataframe().equals(
+        sparse.datacollector.get_model_vars_dataframe())
+    assert [a.pos for a in dense.schedule.agents] == [a.pos for a in sparse.schedule.agents]
+
+
+def test_array_model_sparse_equals_dense():
+    dense = run(ArraySEIR, 30, turtles=300, sparse=False)
+    sparse = run(ArraySEIR, 30, turtles=300, sparse=True)
+    assert dense.datacollector.get_model_vars_dataframe().equals(
+        sparse.datacollector.get_model_vars_dataframe())
+    assert (dense.x == sparse.x).all() and (dense.y == sparse.y).all()
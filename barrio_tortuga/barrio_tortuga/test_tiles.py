@@ -0,0 +1,53 @@
+'''
+Testing the tiled ArraySEIR steps of tiles.run_tiled against the serial ones.
+'''
+
+import numpy as np
+import pytest
+
+from barrio_tortuga.ArraySEIR import ArraySEIR
+from barrio_tortuga.tiles import run_tiled
+
+
+def counts(bt):
+    return bt.datacollector.get_model_vars_dataframe().values
+
+
+@pytest.mark.parametrize('mobility', [1, 0.3])
+def test_tiles_keep_every_turtle(mobility):
+    bt = ArraySEIR(turtles=2000, width=30, height=30, i0=20, mobility=mobility, seed=1)
+    run_tiled(bt, 60, 3)
+    assert counts(bt).shape == (61, 4)
+    assert (counts(bt).sum(axis=1) == 2000).all()
+    assert bt.number_of_agents('S') < 1980
+    assert ((bt.y >= 0) & (bt.y < 30)).all()
+
+
+def test_without_infection_counts_match_serial_run():
+    # r0 = 0: the index cases only recover, at the same ticks whatever the walk
+    tiled = ArraySEIR(turtles=500, width=20, height=20, i0=10, r0=0, seed=2)
+    serial = ArraySEIR(turtles=500, width=20, height=20, i0=10, r0=0, seed=2)
+    run_tiled(tiled, 30, 2)
+    for _ in range(30):
+        serial.step()
+    assert (counts(tiled) == counts(serial)).all()
+    assert tiled.steps == serial.steps == 30
+
+
+def test_unsupported_options_are_rejected():
+    for params in (dict(crn=True), dict(coarse=3), dict(reorder=10)):
+        with pytest.raises(ValueError):
+            run_tiled(ArraySEIR(turtles=100, seed=1, **params), 5, 2)
+
+
+def test_final_size_as_serial_run():
+    tiled, serial = [], []
+    for seed in range(3):
+        bt = ArraySEIR(turtles=2000, width=30, height=30, i0=20, seed=seed)
+        run_tiled(bt, 400, 3)
+        tiled.append(bt.number_of_agents('R'))
+        bt = ArraySEIR(turtles=2000, width=30, height=30, i0=20, seed=seed)
+        for _ in range(400):
+            bt.step()
+        serial.append(bt.number_of_agents('R'))
+    assert abs(np.mean(tiled) - np.mean(serial)) < 0.02 * 2000
@@ -0,0 +1,213 @@
+"""
+Spatial domain decomposition of ArraySEIR over several processes.
+
+The torus is cut in horizontal stripes (tiles), one per worker process. The
+turtle arrays live in shared memory; each worker steps only the turtles
+currently standing in its stripe. Every tick has two synchronisation points:
+
+1) after each worker has written its rows of the shared infection pressure
+   grid. The workers then read one extra row above and below their stripe
+   (the halo ring of the Moore neighbourhood) to infect their susceptibles.
+2) after each worker has moved its turtles and posted the indices of those
+   that left its stripe in its outbox. The neighbouring workers then adopt
+   the migrants that landed in their stripe.
+
+The outboxes are slices of one flat buffer of one entry per turtle: a tile
+cannot post more emigrants than it owns, so the slice of tile k starts at the
+number of turtles owned by the tiles before it. These counts are shared in
+nown, alternately in its two rows, so that a tile can post its count for the
+next tick while the others still read those of this one.
+
+The tile step implements mobility, but not the crn streams, coarse stepping,
+Morton reordering or the trajectory recorder: run_tiled refuses models using
+them. It does not update the transmission tree (infector, infection_tick)
+either.
+
+Each worker counts the S, E, I, R turtles it owns after every tick, and the
+parent adds the counts of all the tiles into the datacollector series.
+"""
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from abmkit.walkers import bulk_move
+
+from . ArraySEIR import S, E, I, R, log_escape, count_kinds
+
+STATE = ('x', 'y', 'kind', 'tti', 'ttr', 'P', 'iel', 'iil')
+
+
+def stripes(height, tiles):
+    """Row boundaries [(y0, y1), ...] of tiles stripes of (almost) equal height"""
+    edges = np.linspace(0, height, tiles + 1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def create_shared(arrays):
+    """Copy a dict of arrays into new shared memory blocks.
+
+    Returns the blocks (to be closed and unlinked by the caller) and the spec
+    {name: (block name, shape, dtype)} that workers use to attach to them.
+    """
+    blocks, spec = {}, {}
+    for name, a in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+        blocks[name] = shm
+        spec[name] = (shm.name, a.shape, a.dtype.str)
+    return blocks, spec
+
+
+def shared_views(blocks, spec):
+    """The shared blocks described by spec, as arrays"""
+    return {name: np.ndarray(shape, dtype, buffer=blocks[name].buf)
+            for name, (_, shape, dtype) in spec.items()}
+
+
+def attach_shared(spec):
+    """Attach to the shared blocks described by spec and map them as arrays"""
+    blocks = {name: shared_memory.SharedMemory(name=shm_name)
+              for name, (shm_name, _, _) in spec.items()}
+    return blocks, shared_views(blocks, spec)
+
+
+def tile_worker(k, bounds, spec, t0, steps, width, height, mobility, seed, barrier):
+    blocks, a = attach_shared(spec)
+    try:
+        step_tile(k, bounds, a, t0, steps, width, height, mobility,
+                  np.random.default_rng(seed), barrier)
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        del a
+        for shm in blocks.values():
+            shm.close()
+
+
+def step_tile(k, bounds, a, t0, steps, width, height, mobility, rng, barrier):
+    x, y, kind = a['x'], a['y'], a['kind']
+    tti, ttr, P, iel, iil = a['tti'], a['ttr'], a['P'], a['iel'], a['iil']
+    L, counts = a['L'], a['counts']
+    outbox, nown, nout = a['outbox'], a['nown'], a['nout']
+
+    tiles = len(bounds)
+    y0, y1 = bounds[k]
+    rows = np.arange(y0 - 1, y1 + 1) % height          # stripe plus halo rows
+    neighbours = sorted({(k - 1) % tiles, (k + 1) % tiles})
+    own = np.flatnonzero((y >= y0) & (y < y1))
+    nown[t0 % 2, k] = len(own)
+
+    for i in range(steps):
+        t = t0 + i
+        kown = kind[own]
+        infectors = own[kown == I]
+
+        # When time is larger than incubation time, become infected
+        exposed = own[kown == E]
+        turn = exposed[t - iel[exposed] > tti[exposed]]
+        kind[turn] = I
+        iil[turn]  = t
+
+        # write own rows of the pressure grid, then read them with the halo
+        L[y0:y1] = np.bincount((y[infectors] - y0) * width + x[infectors],
+                               weights=log_escape(P[infectors]),
+                               minlength=(y1 - y0) * width).reshape(y1 - y0, width)
+        barrier.wait()
+        Lh = L[rows]
+        Ly = Lh[:-2] + Lh[1:-1] + Lh[2:]
+        Lnb = Ly + np.roll(Ly, 1, axis=1) + np.roll(Ly, -1, axis=1)
+
+        susceptible = own[kind[own] == S]
+        Ls = Lnb[y[susceptible] - y0, x[susceptible]]
+        new = susceptible[rng.random(len(susceptible)) < -np.expm1(Ls)]
+        kind[new] = E
+        iel[new]  = t
+
+        # When time is larger than recovery time, become recovered
+        recover = infectors[t - iil[infectors] > ttr[infectors]]
+        kind[recover] = R
+        counts[i + 1, k] = count_kinds(kind[own])
+
+        # move, and post the turtles leaving the stripe
+        moving = own if mobility == 1 else own[rng.random(len(own)) < mobility]
+        x[moving], y[moving] = bulk_move(x[moving], y[moving], width, height, rng)
+        leave = (y[own] < y0) | (y[own] >= y1)
+        emigrants = own[leave]
+        own = own[~leave]
+        starts = np.concatenate([[0], np.cumsum(nown[t % 2])])
+        start = starts[k]
+        outbox[start:start + len(emigrants)] = emigrants
+        nout[k] = len(emigrants)
+        barrier.wait()
+
+        # adopt the migrants of the neighbours that landed here
+        migrants = np.concatenate([outbox[starts[j]:starts[j] + nout[j]] for j in neighbours])
+        own = np.concatenate([own, migrants[(y[migrants] >= y0) & (y[migrants] < y1)]])
+        nown[(t + 1) % 2, k] = len(own)
+
+
+def run_tiled(model, steps, tiles=None):
+    """Advance an ArraySEIR model steps ticks, split in tiles worker processes.
+
+    The state of the model is updated in place and the counts of each tick are
+    added to its datacollector, as if model.step() had been called steps times.
+    tiles defaults to the number of cores.
+
+    Raises ValueError for a model using crn, coarse, reorder or a recorder,
+    which the tile step does not implement (see module docstring).
+    """
+    tiles = tiles or os.cpu_count()
+    if tiles < 2:
+        for i in range(steps):
+            model.step()
+        return
+    unsupported = [name for name, used in (('crn', model.crn),
+                                           ('coarse', model.coarse > 1),
+                                           ('reorder', model.reorder),
+                                           ('record', model.recorder is not None)) if used]
+    if unsupported:
+        raise ValueError(f'run_tiled does not implement {", ".join(unsupported)}')
+    if model.height < tiles:
+        raise ValueError(f'cannot split {model.height} rows in {tiles} tiles')
+
+    arrays = {name: getattr(model, name) for name in STATE}
+    arrays['L']      = np.zeros((model.height, model.width))
+    arrays['outbox'] = np.zeros(model.turtles, dtype=np.int64)
+    arrays['nown']   = np.zeros((2, tiles), dtype=np.int64)
+    arrays['nout']   = np.zeros(tiles, dtype=np.int64)
+    arrays['counts'] = np.zeros((steps + 1, tiles, 4), dtype=np.int64)
+
+    bounds  = stripes(model.height, tiles)
+    seeds   = np.random.SeedSequence(model.rng.integers(2**63)).spawn(tiles)
+    barrier = mp.Barrier(tiles)
+
+    blocks, spec = create_shared(arrays)
+    try:
+        workers = [mp.Process(target=tile_worker,
+                              args=(k, bounds, spec, model.steps, steps,
+                                    model.width, model.height, model.mobility,
+                                    seeds[k], barrier))
+                   for k in range(tiles)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        if any(w.exitcode != 0 for w in workers):
+            raise RuntimeError('a tile worker failed')
+
+        shared = shared_views(blocks, spec)
+        for name in STATE:
+            setattr(model, name, shared[name].copy())
+        counts = shared['counts'][1:].sum(axis=1)
+        del shared
+    finally:
+        for shm in blocks.values():
+            shm.close()
+            shm.unlink()
+
+    model.steps += steps
+    model.datacollector.extend(counts[:, [I, S, R, E]])
@@ -1,23 +1,13 @@
 import numpy as np
 import pandas as pd
-from enum import Enum
 import glob
 import os
 import sys
 
+from abmkit.diagnostics import PrtLvl, print_level
 
-class PrtLvl(Enum):
-    Mute     = 1
-    Concise  = 2
-    Detailed = 3
-    Verbose  = 4
-
-
-def print_level(prtl, PRT):
-    if prtl.value >= PRT.value:
-        return True
-    else:
-        return False
+__all__ = ['PrtLvl', 'print_level',     # re-exported for old notebooks
+           'throw_dice', 'get_files']
 
 
 def throw_dice(dice):
@@ -27,7 +17,15 @@ def throw_dice(dice):
     else:
         return False
 
-def get_files(mdir, path = "/Users/jjgomezcadenas/Projects/Development/mesaTutorials/data/"):
+def get_files(mdir, path = None):
+    """Read all the CSV of the experiment directory mdir into a dict.
+
+    Kept for old notebooks: catalog.Catalog indexes the experiments and
+    reads only the runs selected.
+    """
+    if path is None:
+        from . catalog import DATA
+        path = DATA
     mpath = os.path.join(path, mdir)
     FLS = glob.glob(mpath+"/*.csv", recursive=False)
     FND = {}   # file name dict
@@ -0,0 +1,84 @@
+"""
+Validation of the coarse stepping of ArraySEIR against the fixed step.
+
+validate_coarse runs ensembles of ArraySEIR with coarse = 1 (the reference)
+and with each of the coarse values asked, and reports per value
+    seconds     : wall time of the ensemble.
+    work        : turtle ticks stepped one by one, over turtles x steps.
+    curve_error : largest difference between the mean NumberOfInfected curve
+                  and the reference one, over the reference peak.
+    curve_noise : the same quantity expected from the replica noise alone
+                  (standard error of the difference at the reference peak).
+and, for the metrics of analysis.summary, the difference of their means to
+the reference with its standard error. A coarse value is fine when the
+differences are within a few standard errors and the curve error within a
+few times the noise (it is a maximum over all the ticks).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import time
+
+import numpy as np
+import pandas as pd
+
+from . ArraySEIR import ArraySEIR
+from . columns import COLUMNS
+from . analysis import summary, CI
+
+
+def run_coarse(seed, steps, coarse, params):
+    """One replica: counts in ensemble.COLUMNS order, seconds and work"""
+    t0 = time.perf_counter()
+    bt = ArraySEIR(seed=seed, coarse=coarse, **params)
+    for _ in range(steps):
+        bt.step()
+    seconds = time.perf_counter() - t0
+    runs = bt.datacollector.get_model_vars_dataframe()[list(COLUMNS)].values
+    return runs, seconds, bt.stepped / (bt.turtles * steps)
+
+
+def validate_coarse(coarse    = (5, 10),
+                    ns        = 20,
+                    steps     = 500,
+                    seed      = None,
+                    processes = None,     # worker processes, default number of cores
+                    tmax      = 25,       # ticks used by the R0 estimate
+                    **params):
+    """Compare ensembles of ArraySEIR(coarse=c, **params) with coarse=1.
+    Returns a DataFrame indexed by coarse (see module docstring)."""
+    values = [1] + [c for c in coarse if c != 1]
+    seeds  = np.random.SeedSequence(seed).generate_state(ns * len(values))
+    args   = [(int(seeds[i * ns + j]), steps, c, params)
+              for i, c in enumerate(values) for j in range(ns)]
+    if processes == 1:
+        results = [run_coarse(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            results = [f.result() for f in [pool.submit(run_coarse, *a) for a in args]]
+
+    tr  = params.get('tr', 3.5)
+    tpd = params.get('ticks_per_day', 5)
+    ens = {}
+    for i, c in enumerate(values):
+        res = results[i * ns:(i + 1) * ns]
+        runs = np.array([r[0] for r in res])
+        ens[c] = dict(runs=runs, summary=summary(runs, tmax, tr, tpd),
+                      seconds=sum(r[1] for r in res), work=np.mean([r[2] for r in res]))
+
+    ref   = ens[1]
+    I_ref = ref['runs'][:, :, CI]
+    peak  = I_ref.mean(axis=0).max()
+    tpk   = I_ref.mean(axis=0).argmax()
+    rows  = {}
+    for c in values:
+        I_c = ens[c]['runs'][:, :, CI]
+        row = dict(seconds=ens[c]['seconds'], work=ens[c]['work'],
+                   curve_error=np.abs(I_c.mean(axis=0) - I_ref.mean(axis=0)).max() / peak,
+                   curve_noise=np.sqrt((I_c[:, tpk].var(ddof=1) + I_ref[:, tpk].var(ddof=1))
+                                       / ns) / peak)
+        s, r = ens[c]['summary'], ref['summary']
+        for metric in s:
+            row[metric] = s[metric].mean() - r[metric].mean()
+            row[metric + '_se'] = np.sqrt((s[metric].var(ddof=1) + r[metric].var(ddof=1)) / ns)
+        rows[c] = row
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('coarse')
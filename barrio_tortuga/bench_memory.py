@@ -0,0 +1,64 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from mesa import Agent
+
+from abmkit.diagnostics import PrtLvl
+from barrio_tortuga.BarrioTortugaSEIR import BarrioTortugaSEIR, SeirTurtle
+from barrio_tortuga.BarrioTortuga import Turtle
+from barrio_tortuga.RandomTurtle import RandomTurtle
+
+
+def slot_names(cls):
+    return [name for c in reversed(cls.__mro__) for name in c.__dict__.get('__slots__', ())]
+
+
+def clones(cls, template, names, n):
+    """n agents of class cls with the attributes names of template"""
+    agents = []
+    for _ in range(n):
+        a = cls.__new__(cls)
+        for name in names:
+            setattr(a, name, getattr(template, name))
+        agents.append(a)
+    return agents
+
+
+def traced_bytes(f, *args):
+    tracemalloc.start()
+    try:
+        out = f(*args)
+        return tracemalloc.get_traced_memory()[0], out
+    finally:
+        tracemalloc.stop()
+
+
+def bytes_per_agent(template, n=100000):
+    """Bytes taken by each of n agents like template, slotted (after) and as a
+    mesa.Agent with the same attributes in its __dict__ (before). The attribute
+    values are shared by all the clones, so only the agent layout is counted."""
+    names = slot_names(type(template))
+    after, _  = traced_bytes(clones, type(template), template, names, n)
+    before, _ = traced_bytes(clones, Agent, template, names, n)
+    return dict(attributes=len(names), before=before / n, after=after / n)
+
+
+def bench_memory(n=100000, turtles=100000, width=300, height=300):
+    """Bytes per agent of the turtle classes, and bytes per turtle of a
+    BarrioTortugaSEIR(turtles) (agents, grid and schedule)"""
+    model = BarrioTortugaSEIR(turtles=100, width=10, height=10, prtl=PrtLvl.Mute)
+    templates = {'SeirTurtle'  : SeirTurtle(0, (0, 0), 0, 27.5, 17.5, 0.01, model),
+                 'Turtle'      : Turtle(0, (0, 0), model),
+                 'RandomTurtle': RandomTurtle(0, (0, 0), model)}
+    rows = {name: bytes_per_agent(t, n) for name, t in templates.items()}
+    print(pd.DataFrame.from_dict(rows, orient='index'))
+
+    np.random.seed(1)
+    total, _ = traced_bytes(lambda: BarrioTortugaSEIR(turtles=turtles, width=width,
+                                                      height=height, prtl=PrtLvl.Mute))
+    print(f'BarrioTortugaSEIR with {turtles} turtles: {total / turtles:.0f} bytes per turtle')
+
+
+if __name__ == '__main__':
+    bench_memory()
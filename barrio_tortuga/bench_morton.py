@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from abmkit.morton import morton_order
+from barrio_tortuga.ArraySEIR import ArraySEIR
+
+
+def bench_gather(turtles = 10**6,
+                 width   = 1000,
+                 height  = 1000,
+                 repeats = 20,
+                 seed    = 1):
+    """Seconds of the per cell gather and scatter of a tick (pressure[cell] and
+    bincount over the cells) with the turtles in random and in Morton order"""
+    rng = np.random.default_rng(seed)
+    x = rng.integers(width, size=turtles)
+    y = rng.integers(height, size=turtles)
+    pressure = rng.random(width * height)
+    w = rng.random(turtles)
+    rows = {}
+    for name, order in (('random', np.arange(turtles)), ('morton', morton_order(x, y))):
+        cell = (y * width + x)[order]
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            pressure[cell]
+        gather = (time.perf_counter() - t0) / repeats
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            np.bincount(cell, weights=w, minlength=width * height)
+        rows[name] = dict(gather=gather, scatter=(time.perf_counter() - t0) / repeats)
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def bench_morton(turtles  = 10**6,
+                 width    = 1000,
+                 height   = 1000,
+                 i0       = 1000,
+                 steps    = 200,
+                 reorders = (0, 25, 100),
+                 seed     = 1,
+                 **params):
+    """Seconds per tick of ArraySEIR(reorder=n) for each n of reorders (0, no sorting),
+    and the epidemic size reached, which must not depend on n but for the noise"""
+    rows = {}
+    for n in reorders:
+        bt = ArraySEIR(turtles=turtles, width=width, height=height, i0=i0,
+                       reorder=n, seed=seed, **params)
+        t0 = time.perf_counter()
+        for _ in range(steps):
+            bt.step()
+        rows[n] = dict(seconds_per_tick=(time.perf_counter() - t0) / steps,
+                       infected=bt.turtles - bt.number_of_agents('S'))
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('reorder')
+
+
+if __name__ == '__main__':
+    print(bench_gather())
+    print(bench_morton())
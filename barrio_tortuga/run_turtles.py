@@ -1,5 +1,9 @@
 from scipy.stats import gamma
 from barrio_tortuga.BarrioTortugaSEIR import BarrioTortugaSEIR
+from barrio_tortuga.ArraySEIR import ArraySEIR
+from barrio_tortuga.tiles import run_tiled
+from barrio_tortuga.ensemble import run_ensemble, run_frames, stats_frames, average_frame
+from barrio_tortuga.BatchSEIR import run_batched
 import pandas as pd
 import os
 import sys
@@ -19,18 +23,26 @@ def run_turtles(steps          = 500,
                 tr_dist        = 'F',
                 p_dist         = 'F',    # F for fixed, S for Binomial, P for Poissoin
                 width          = 40,
-                height         = 40):
+                height         = 40,
+                tiles          = 1):    # tiles > 1 runs ArraySEIR split in tiles processes
 
     print(f" Running Simulation with {turtles}  turtles, for {steps} steps.")
-    bt = BarrioTortugaSEIR(ticks_per_day, turtles, i0, r0, ti, tr,
-                           ti_dist, tr_dist, p_dist,
-                           width, height)
-
-    for i in range(steps):
-        if i%fprint == 0:
-            print(f' step {i}')
-        bt.step()
-    print('Done!')
+    if tiles > 1:
+        bt = ArraySEIR(ticks_per_day, turtles, i0, r0, ti, tr,
+                       ti_dist, tr_dist, p_dist,
+                       width, height)
+        run_tiled(bt, steps, tiles)
+        print('Done!')
+    else:
+        bt = BarrioTortugaSEIR(ticks_per_day, turtles, i0, r0, ti, tr,
+                               ti_dist, tr_dist, p_dist,
+                               width, height)
+
+        for i in range(steps):
+            if i%fprint == 0:
+                print(f' step {i}')
+            bt.step()
+        print('Done!')
 
     STATS = {}
     STATS['Ti'] = bt.Ti
@@ -47,7 +59,6 @@ def run_series(ns=100,
                csv            = False,
                path           ="/Users/jjgomezcadenas/Projects/Development/mesaTutorials/data",
                steps          = 500,
-               fprint         = 25,
                ticks_per_day  = 5,
                turtles        = 10000,
                i0             = 10,
@@ -58,8 +69,12 @@ def run_series(ns=100,
                tr_dist        = 'F',
                p_dist         = 'F',    # F for fixed, S for Binomial, P for Poissoin
                width          = 40,
-               height         = 40):
+               height         = 40,
+               tiles          = 1,
+               processes      = None,   # worker processes, default number of cores
+               batch          = False): # run all the replicas at once with BatchSEIR
 
+    mdir = None
     if csv:
         fn1 = f'Turtles_{turtles}_steps_{steps}_i0_{i0}_r0_{r0}_ti_{ti}_tr_{tr}'
         fn2 = f'Tid_{ti_dist}_Tir_{tr_dist}_Pdist_{p_dist}'
@@ -83,20 +98,25 @@ def run_series(ns=100,
             sys.exit()
 
 
-    STATS = []
-    DFT   = []
-    for i in range(ns):
-        dft, stats = run_turtles(steps, fprint, ticks_per_day, turtles, i0, r0,
-                                 ti, tr,
-                                 ti_dist, tr_dist, p_dist,
-                                 width, height)
-
-        STATS.append(stats)
-        DFT.append(dft)
-
-
-    df  = pd.concat(DFT)
-    dfs = pd.concat(STATS)
+    params = dict(ticks_per_day  = ticks_per_day,
+                  turtles        = turtles,
+                  i0             = i0,
+                  r0             = r0,
+                  ti             = ti,
+                  tr             = tr,
+                  ti_dist        = ti_dist,
+                  tr_dist        = tr_dist,
+                  p_dist         = p_dist,
+                  width          = width,
+                  height         = height)
+    if batch:
+        runs, stats = run_batched(ns, steps, path=mdir, **params)
+    else:
+        model = ArraySEIR if tiles > 1 else BarrioTortugaSEIR
+        runs, stats = run_ensemble(ns, steps, processes, mdir, model=model, tiles=tiles,
+                                   **params)
+    DFT   = run_frames(runs)
+    STATS = stats_frames(stats)
 
     if csv:
 
@@ -107,25 +127,26 @@ def run_series(ns=100,
 
         file=f'DFT_run_average.csv'
         mfile = os.path.join(mdir, file)
-        df.groupby(df.index).mean().to_csv(mfile, sep=" ")
+        average_frame(runs).to_csv(mfile, sep=" ")
 
         file=f'STA.csv'
         mfile = os.path.join(mdir, file)
         STATS[0].to_csv(mfile, sep=" ")
-        #dfs.groupby(dfs.index).mean().to_csv(mfile, sep=" ")
-
-run_series(ns             = 10,
-           csv            = True,
-           steps          = 500,
-           fprint         = 25,
-           ticks_per_day  = 5,
-           turtles        = 10000,
-           i0             = 10,
-           r0             = 3.5,
-           ti             = 5.5,
-           tr             = 6.5,
-           ti_dist        = 'F',    # F for fixed, E for exp G for Gamma
-           tr_dist        = 'F',
-           p_dist         = 'F',    # F for fixed, S for Binomial, P for Poissoin
-           width          = 40,
-           height         = 40)
+
+    return DFT, STATS
+
+if __name__ == '__main__':
+    run_series(ns             = 10,
+               csv            = True,
+               steps          = 500,
+               ticks_per_day  = 5,
+               turtles        = 10000,
+               i0             = 10,
+               r0             = 3.5,
+               ti             = 5.5,
+               tr             = 6.5,
+               ti_dist        = 'F',    # F for fixed, E for exp G for Gamma
+               tr_dist        = 'F',
+               p_dist         = 'F',    # F for fixed, S for Binomial, P for Poissoin
+               width          = 40,
+               height         = 40)
@@ -4,6 +4,7 @@ from mesa.visualization.UserParam import UserSettableParameter
 
 from barrio_tortuga.BarrioTortugaSEIR import BarrioTortugaSEIR
 from barrio_tortuga.BarrioTortugaSEIR import SeirTurtle
+from barrio_tortuga.ArraySEIR import Kind
 
 def turtle_portrayal(agent):
     portrayal = {}
@@ -11,16 +12,16 @@ def turtle_portrayal(agent):
         portrayal = {"Shape": "circle",
                      "Filled": "true",
                      "r": 0.5}
-        if agent.kind == "S":
+        if agent.kind == Kind.S:
             portrayal["Color"] = "white"
             portrayal["Layer"] = 0
-        elif agent.kind == "E":
+        elif agent.kind == Kind.E:
             portrayal["Color"] = "blue"
             portrayal["Layer"] = 0
-        elif agent.kind == "I":
+        elif agent.kind == Kind.I:
             portrayal["Color"] = "red"
             portrayal["Layer"] = 0
-        elif agent.kind == "B":
+        elif agent.kind == Kind.R:
             portrayal["Color"] = "green"
             portrayal["Layer"] = 0
 
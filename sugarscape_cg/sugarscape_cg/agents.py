@@ -1,6 +1,6 @@
 import math
 
-from mesa import Agent
+from abmkit.agent import SlotAgent
 
 
 def get_distance(pos_1, pos_2):
@@ -17,7 +17,9 @@ def get_distance(pos_1, pos_2):
     return math.sqrt(dx ** 2 + dy ** 2)
 
 
-class SsAgent(Agent):
+class SsAgent(SlotAgent):
+    __slots__ = ('moore', 'sugar', 'metabolism', 'vision')
+
     def __init__(self, pos, model, moore=False, sugar=0, metabolism=0, vision=0):
         super().__init__(pos, model)
         self.pos = pos
@@ -65,7 +67,9 @@ class SsAgent(Agent):
             self.model.schedule.remove(self)
 
 
-class Sugar(Agent):
+class Sugar(SlotAgent):
+    __slots__ = ('amount', 'max_sugar')
+
     def __init__(self, pos, model, max_sugar):
         super().__init__(pos, model)
         self.amount = max_sugar
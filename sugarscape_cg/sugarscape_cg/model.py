@@ -11,7 +11,8 @@ Northwestern University, Evanston, IL.
 
 from mesa import Model
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
+
+from abmkit.collector import ArrayCollector
 
 from .agents import SsAgent, Sugar
 from .schedule import RandomActivationByBreed
@@ -40,7 +41,8 @@ class SugarscapeCg(Model):
 
         self.schedule = RandomActivationByBreed(self)
         self.grid = MultiGrid(self.height, self.width, torus=False)
-        self.datacollector = DataCollector({"SsAgent": lambda m: m.schedule.get_breed_count(SsAgent), })
+        self.datacollector = ArrayCollector({"SsAgent": lambda m: m.schedule.get_breed_count(SsAgent), },
+                                            dtype=int)
 
         # Create sugar
         import numpy as np
@@ -1,4 +1,4 @@
-from mesa import Agent
+from abmkit.agent import SlotAgent
 from wolf_sheep.random_walk import RandomWalker
 
 
@@ -9,7 +9,7 @@ class Sheep(RandomWalker):
     The init is the same as the RandomWalker.
     '''
 
-    energy = None
+    __slots__ = ('energy',)
 
     def __init__(self, unique_id, pos, model, moore, energy=None):
         super().__init__(unique_id, pos, model, moore=moore)
@@ -55,7 +55,7 @@ class Wolf(RandomWalker):
     A wolf that walks around, reproduces (asexually) and eats sheep.
     '''
 
-    energy = None
+    __slots__ = ('energy',)
 
     def __init__(self, unique_id, pos, model, moore, energy=None):
         super().__init__(unique_id, pos, model, moore=moore)
@@ -91,11 +91,13 @@ class Wolf(RandomWalker):
                 self.model.schedule.add(cub)
 
 
-class GrassPatch(Agent):
+class GrassPatch(SlotAgent):
     '''
     A patch of grass that grows at a fixed rate and it is eaten by sheep
     '''
 
+    __slots__ = ('fully_grown', 'countdown')
+
     def __init__(self, unique_id, pos, model, fully_grown, countdown):
         '''
         Creates a new patch of grass
@@ -0,0 +1,274 @@
+'''
+Wolf-Sheep Predation Model, array backend
+================================
+
+Same dynamics as wolf_sheep.model.WolfSheep, but wolves and sheep are rows
+of growable NumPy arrays (position, energy, alive) instead of Agent objects.
+A step is a handful of array operations per breed, so populations in the
+hundreds of thousands can be run.
+
+Differences with the agent version:
+    - all the agents of a breed move before any of them eats, instead of
+      move-eat one agent at a time.
+    - predation is resolved per cell: wolves and sheep sharing a cell are
+      ranked in random order and the first min(wolves, sheep) wolves each
+      eat one sheep.
+
+With reorder = n > 0 the rows of each breed are sorted every n steps by the
+Morton index of their cell (abmkit.morton), so that the per cell gathers of
+a step (grass, counts of the other breed) go through memory mostly in
+sequence. The agents have no identity beyond their row.
+'''
+
+import numpy as np
+
+from mesa import Model
+
+from abmkit.collector import ArrayCollector
+from abmkit.morton import morton_order
+from abmkit.walkers import bulk_move
+
+
+class Population:
+    '''
+    Growable arrays holding the state of one breed.
+
+    Rows [0, n) are in use. Births are appended in bulk (capacity doubles
+    when exceeded) and deaths are removed by compacting the live rows.
+    '''
+
+    def __init__(self, capacity=1024):
+        self.n = 0
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.energy = np.zeros(capacity, dtype=np.float64)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self):
+        return len(self.x)
+
+    def _grow(self, size):
+        capacity = self.capacity
+        while capacity < size:
+            capacity *= 2
+        for name in ('x', 'y', 'energy', 'alive'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def append(self, x, y, energy):
+        '''
+        Add len(x) new agents at the end of the arrays.
+        '''
+        k = len(x)
+        if self.n + k > self.capacity:
+            self._grow(self.n + k)
+        s = slice(self.n, self.n + k)
+        self.x[s] = x
+        self.y[s] = y
+        self.energy[s] = energy
+        self.alive[s] = True
+        self.n += k
+
+    def permute(self, order):
+        '''
+        Put the live rows in the given order.
+        '''
+        for name in ('x', 'y', 'energy', 'alive'):
+            a = getattr(self, name)
+            a[:self.n] = a[order]
+
+    def compact(self):
+        '''
+        Drop the rows whose alive flag is False, keeping the order of the rest.
+        '''
+        keep = np.flatnonzero(self.alive[:self.n])
+        k = len(keep)
+        for name in ('x', 'y', 'energy', 'alive'):
+            a = getattr(self, name)
+            a[:k] = a[keep]
+        self.n = k
+
+
+def rank_in_cell(cell, rng):
+    '''
+    Random rank of each agent among the agents sharing its cell.
+
+    Agents are shuffled within each cell; the first one gets rank 0, the
+    second rank 1 and so on.
+    '''
+    n = len(cell)
+    order = np.lexsort((rng.random(n), cell))
+    sorted_cell = cell[order]
+    first = np.ones(n, dtype=bool)
+    first[1:] = sorted_cell[1:] != sorted_cell[:-1]
+    start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - start
+    return rank
+
+
+class ArrayWolfSheep(Model):
+    '''
+    Wolf-Sheep Predation Model on NumPy arrays
+    '''
+
+    description = 'Array backend of the wolf and sheep (predator-prey) model.'
+
+    verbose = False  # Print-monitoring
+
+    def __init__(self, height=20, width=20,
+                 initial_sheep=100, initial_wolves=50,
+                 sheep_reproduce=0.04, wolf_reproduce=0.05,
+                 wolf_gain_from_food=20,
+                 grass=False, grass_regrowth_time=30, sheep_gain_from_food=4,
+                 reorder=0, seed=None):
+        '''
+        Create a new Wolf-Sheep model with the given parameters.
+
+        Args: as in wolf_sheep.model.WolfSheep, plus
+            reorder: steps between Morton sorts of the agents, 0 for never.
+            seed: seed of the NumPy random generator.
+        '''
+        super().__init__()
+        self.height = height
+        self.width = width
+        self.initial_sheep = initial_sheep
+        self.initial_wolves = initial_wolves
+        self.sheep_reproduce = sheep_reproduce
+        self.wolf_reproduce = wolf_reproduce
+        self.wolf_gain_from_food = wolf_gain_from_food
+        self.grass = grass
+        self.grass_regrowth_time = grass_regrowth_time
+        self.sheep_gain_from_food = sheep_gain_from_food
+
+        self.reorder = reorder
+        self.rng = np.random.default_rng(seed)
+        self.steps = 0
+        self.ncells = self.width * self.height
+
+        self.sheep = Population(max(1024, 2 * initial_sheep))
+        self.wolves = Population(max(1024, 2 * initial_wolves))
+        self.datacollector = ArrayCollector(
+            {"Wolves": lambda m: m.wolves.n,
+             "Sheep": lambda m: m.sheep.n},
+            dtype=int)
+
+        # Create sheep and wolves
+        for pop, n, gain in ((self.sheep, initial_sheep, sheep_gain_from_food),
+                             (self.wolves, initial_wolves, wolf_gain_from_food)):
+            pop.append(self.rng.integers(self.width, size=n),
+                       self.rng.integers(self.height, size=n),
+                       self.rng.integers(2 * gain, size=n))
+
+        # Create grass patches, one per cell
+        if self.grass:
+            self.fully_grown = self.rng.random(self.ncells) < 0.5
+            self.countdown = np.where(
+                self.fully_grown, grass_regrowth_time,
+                self.rng.integers(grass_regrowth_time, size=self.ncells))
+
+        self.running = True
+        self.datacollector.collect(self)
+
+    def cell(self, pop):
+        return pop.y[:pop.n] * self.width + pop.x[:pop.n]
+
+    def move(self, pop):
+        '''
+        Every agent steps to a random cell of its Moore neighborhood,
+        including its own.
+        '''
+        pop.x[:pop.n], pop.y[:pop.n] = bulk_move(pop.x[:pop.n], pop.y[:pop.n],
+                                                 self.width, self.height, self.rng)
+
+    def reproduce(self, pop, prob, halve):
+        '''
+        Each live agent gives birth with probability prob to a new agent
+        in its cell. If halve the parent shares its energy with the child.
+        '''
+        parents = np.flatnonzero(pop.alive[:pop.n] &
+                                 (self.rng.random(pop.n) < prob))
+        if halve:
+            pop.energy[parents] /= 2
+        pop.append(pop.x[parents], pop.y[parents], pop.energy[parents])
+
+    def step_sheep(self):
+        sheep = self.sheep
+        self.move(sheep)
+
+        if self.grass:
+            sheep.energy[:sheep.n] -= 1
+
+            # one sheep per cell with grown grass eats it
+            cell = self.cell(sheep)
+            rank = rank_in_cell(cell, self.rng)
+            eats = (rank == 0) & self.fully_grown[cell]
+            sheep.energy[:sheep.n][eats] += self.sheep_gain_from_food
+            self.fully_grown[cell[eats]] = False
+
+            # Death
+            sheep.alive[:sheep.n] &= sheep.energy[:sheep.n] >= 0
+
+        self.reproduce(sheep, self.sheep_reproduce, self.grass)
+        sheep.compact()
+
+    def step_wolves(self):
+        wolves, sheep = self.wolves, self.sheep
+        self.move(wolves)
+        wolves.energy[:wolves.n] -= 1
+
+        # In each cell the first min(wolves, sheep) wolves eat one sheep each
+        wcell = self.cell(wolves)
+        scell = self.cell(sheep)
+        nwolves = np.bincount(wcell, minlength=self.ncells)
+        nsheep = np.bincount(scell, minlength=self.ncells)
+        eats = rank_in_cell(wcell, self.rng) < nsheep[wcell]
+        eaten = rank_in_cell(scell, self.rng) < nwolves[scell]
+        wolves.energy[:wolves.n][eats] += self.wolf_gain_from_food
+        sheep.alive[:sheep.n] &= ~eaten
+        sheep.compact()
+
+        # Death or reproduction
+        wolves.alive[:wolves.n] &= wolves.energy[:wolves.n] >= 0
+        self.reproduce(wolves, self.wolf_reproduce, True)
+        wolves.compact()
+
+    def step_grass(self):
+        regrow = ~self.fully_grown & (self.countdown <= 0)
+        self.countdown[~self.fully_grown & ~regrow] -= 1
+        self.countdown[regrow] = self.grass_regrowth_time
+        self.fully_grown |= regrow
+
+    def reorder_agents(self):
+        for pop in (self.sheep, self.wolves):
+            pop.permute(morton_order(pop.x[:pop.n], pop.y[:pop.n]))
+
+    def step(self):
+        if self.reorder and self.steps % self.reorder == 0:
+            self.reorder_agents()
+        self.step_sheep()
+        self.step_wolves()
+        if self.grass:
+            self.step_grass()
+        self.steps += 1
+        # collect data
+        self.datacollector.collect(self)
+        if self.verbose:
+            print([self.steps, self.wolves.n, self.sheep.n])
+
+    def run_model(self, step_count=200):
+
+        if self.verbose:
+            print('Initial number wolves: ', self.wolves.n)
+            print('Initial number sheep: ', self.sheep.n)
+
+        for i in range(step_count):
+            self.step()
+
+        if self.verbose:
+            print('')
+            print('Final number wolves: ', self.wolves.n)
+            print('Final number sheep: ', self.sheep.n)
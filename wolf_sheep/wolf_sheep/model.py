@@ -9,9 +9,13 @@ Replication of the model found in NetLogo:
     Northwestern University, Evanston, IL.
 '''
 
+import itertools
+
 from mesa import Model
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
+
+from abmkit.collector import ArrayCollector
+from abmkit.grid import SparseMultiGrid
 
 from wolf_sheep.agents import Sheep, Wolf, GrassPatch
 from wolf_sheep.schedule import RandomActivationByBreed
@@ -45,7 +49,8 @@ class WolfSheep(Model):
                  initial_sheep=100, initial_wolves=50,
                  sheep_reproduce=0.04, wolf_reproduce=0.05,
                  wolf_gain_from_food=20,
-                 grass=False, grass_regrowth_time=30, sheep_gain_from_food=4):
+                 grass=False, grass_regrowth_time=30, sheep_gain_from_food=4,
+                 sparse=False):
         '''
         Create a new Wolf-Sheep model with the given parameters.
 
@@ -59,6 +64,8 @@ class WolfSheep(Model):
             grass_regrowth_time: How long it takes for a grass patch to regrow
                                  once it is eaten
             sheep_gain_from_food: Energy sheep gain from grass, if enabled.
+            sparse: Use a SparseMultiGrid, holding only the occupied cells
+                    (for huge worlds; grass puts a patch in every cell).
         '''
         super().__init__()
         # Set parameters
@@ -74,10 +81,14 @@ class WolfSheep(Model):
         self.sheep_gain_from_food = sheep_gain_from_food
 
         self.schedule = RandomActivationByBreed(self)
-        self.grid = MultiGrid(self.height, self.width, torus=True)
-        self.datacollector = DataCollector(
+        if sparse:
+            self.grid = SparseMultiGrid(self.height, self.width, torus=True)
+        else:
+            self.grid = MultiGrid(self.height, self.width, torus=True)
+        self.datacollector = ArrayCollector(
             {"Wolves": lambda m: m.schedule.get_breed_count(Wolf),
-             "Sheep": lambda m: m.schedule.get_breed_count(Sheep)})
+             "Sheep": lambda m: m.schedule.get_breed_count(Sheep)},
+            dtype=int)
 
         # Create sheep:
         for i in range(self.initial_sheep):
@@ -99,7 +110,9 @@ class WolfSheep(Model):
 
         # Create grass patches
         if self.grass:
-            for agent, x, y in self.grid.coord_iter():
+            # every cell, in the order of coord_iter (which for a sparse grid
+            # only visits the occupied ones)
+            for x, y in itertools.product(range(self.grid.width), range(self.grid.height)):
 
                 fully_grown = self.random.choice([True, False])
 
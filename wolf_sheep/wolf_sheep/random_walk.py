@@ -2,10 +2,11 @@
 Generalized behavior for random walking, one grid cell at a time.
 '''
 
-from mesa import Agent
+from abmkit import walkers
+from abmkit.agent import SlotAgent
 
 
-class RandomWalker(Agent):
+class RandomWalker(SlotAgent):
     '''
     Class implementing random walker methods in a generalized manner.
 
@@ -14,10 +15,7 @@ class RandomWalker(Agent):
 
     '''
 
-    grid = None
-    x = None
-    y = None
-    moore = True
+    __slots__ = ('moore',)
 
     def __init__(self, unique_id, pos, model, moore=True):
         '''
@@ -35,8 +33,4 @@ class RandomWalker(Agent):
         '''
         Step one cell in any allowable direction.
         '''
-        # Pick the next cell from the adjacent cells.
-        next_moves = self.model.grid.get_neighborhood(self.pos, self.moore, True)
-        next_move = self.random.choice(next_moves)
-        # Now move:
-        self.model.grid.move_agent(self, next_move)
+        walkers.random_move(self, self.moore)
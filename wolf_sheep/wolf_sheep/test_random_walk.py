@@ -16,6 +16,8 @@ class WalkerAgent(RandomWalker):
     Agent which only walks around.
     '''
 
+    __slots__ = ()
+
     def step(self):
         self.random_move()
 
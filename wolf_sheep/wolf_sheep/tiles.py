@@ -0,0 +1,123 @@
+'''
+Spatial domain decomposition of ArrayWolfSheep over several processes.
+
+The torus is cut in horizontal stripes (tiles), one per worker process. Each
+worker runs an ArrayWolfSheep on its stripe, in local row coordinates. Wolves,
+sheep and grass only interact within a cell, so no halo is needed: after each
+move, the agents that stepped out of the stripe are sent (position and
+energy) to the neighbouring tile, and the ones coming in are appended, before
+anybody eats.
+'''
+
+import multiprocessing as mp
+import os
+import queue
+
+import numpy as np
+
+from wolf_sheep.array_model import ArrayWolfSheep
+
+
+def stripes(height, tiles):
+    '''
+    Row boundaries [(y0, y1), ...] of tiles stripes of (almost) equal height.
+    '''
+    edges = np.linspace(0, height, tiles + 1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class TileWolfSheep(ArrayWolfSheep):
+    '''
+    The rows [y0, y1) of a larger Wolf-Sheep world, in local coordinates.
+
+    Agents stepping out through the top (bottom) row are sent to the tile
+    above (below), and the agents coming from those tiles are read from the
+    inboxes, one message per neighbour and move.
+    '''
+
+    def __init__(self, rows_above, to_above, to_below,
+                 from_above, from_below, **params):
+        self.rows_above = rows_above
+        self.to_above = to_above
+        self.to_below = to_below
+        self.from_above = from_above
+        self.from_below = from_below
+        super().__init__(**params)
+
+    def move(self, pop):
+        d = self.rng.integers(-1, 2, size=(2, pop.n))
+        pop.x[:pop.n] = (pop.x[:pop.n] + d[0]) % self.width
+        pop.y[:pop.n] += d[1]
+        y = pop.y[:pop.n]
+
+        up = y < 0
+        down = y >= self.height
+        for leaving, box, shift in ((up, self.to_above, self.rows_above),
+                                    (down, self.to_below, -self.height)):
+            box.put((pop.x[:pop.n][leaving], y[leaving] + shift,
+                     pop.energy[:pop.n][leaving]))
+        pop.alive[:pop.n] &= ~(up | down)
+        pop.compact()
+
+        for box in (self.from_above, self.from_below):
+            pop.append(*box.get())
+
+
+def tile_worker(k, bounds, queues, results, steps, params):
+    tiles = len(bounds)
+    y0, y1 = bounds[k]
+    above, below = (k - 1) % tiles, (k + 1) % tiles
+    a0, a1 = bounds[above]
+    model = TileWolfSheep(a1 - a0,
+                          queues[above]['from_below'], queues[below]['from_above'],
+                          queues[k]['from_above'], queues[k]['from_below'],
+                          height=y1 - y0, **params)
+    model.run_model(steps)
+    results.put((k, model.datacollector.get_model_vars_dataframe()))
+
+
+def run_tiled(steps=200, tiles=None, seed=None, height=20, width=20,
+              initial_sheep=100, initial_wolves=50, **params):
+    '''
+    Run the Wolf-Sheep model for steps ticks, split in tiles worker processes.
+
+    The other arguments are those of ArrayWolfSheep. The initial agents are
+    spread over the stripes in proportion to their area. Returns the Wolves
+    and Sheep series of the whole world, as the datacollector would.
+    tiles defaults to the number of cores.
+    '''
+    tiles = tiles or os.cpu_count()
+    if height < tiles:
+        raise ValueError(f'cannot split {height} rows in {tiles} tiles')
+
+    bounds = stripes(height, tiles)
+    rng = np.random.default_rng(seed)
+    seeds = rng.integers(2**63, size=tiles).tolist()
+    share = np.diff([b[0] for b in bounds] + [height]) / height
+    sheep = rng.multinomial(initial_sheep, share)
+    wolves = rng.multinomial(initial_wolves, share)
+
+    queues = [{'from_above': mp.Queue(), 'from_below': mp.Queue()}
+              for k in range(tiles)]
+    results = mp.Queue()
+    workers = [mp.Process(target=tile_worker,
+                          args=(k, bounds, queues, results, steps,
+                                dict(params, width=width, seed=seeds[k],
+                                     initial_sheep=sheep[k],
+                                     initial_wolves=wolves[k])))
+               for k in range(tiles)]
+    for w in workers:
+        w.start()
+    dfs = {}
+    while len(dfs) < tiles:
+        try:
+            k, df = results.get(timeout=1)
+            dfs[k] = df
+        except queue.Empty:
+            if any(w.exitcode not in (None, 0) for w in workers):
+                for w in workers:
+                    w.terminate()
+                raise RuntimeError('a tile worker failed')
+    for w in workers:
+        w.join()
+    return sum(dfs[k] for k in range(tiles))